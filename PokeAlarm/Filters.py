@@ -1,11 +1,10 @@
 # Standard Library Imports
-import copy
 import sys
 import logging
 # 3rd Party Imports
 # Local Imports
 from Utils import parse_boolean, reject_leftover_parameters, get_team_id,\
-    get_move_id, get_pkmn_id, require_and_remove_key, get_dist_as_str
+    get_move_ids, get_pkmn_id, require_and_remove_key, get_dist_as_str
 
 
 log = logging.getLogger('Filters')
@@ -16,45 +15,127 @@ named_filters = {}
 # Maps names to lists of alternative filters.
 filter_sets  = {}
 
+# Marks a setting that wasn't given (so falsy values like 0 can be used)
+_MISSING = object()
+
+# Maps the gender letters used in Filters files to the gender symbols
+_WORD_TO_GLYPH = {'M': u'\u2642', 'F': u'\u2640', 'N': u'\u26b2'}
+_GLYPH_TO_WORD = {v: k for k, v in _WORD_TO_GLYPH.iteritems()}
+
+# Bits used to represent sizes, genders and teams in filter masks
+_SIZE_BIT = {'T': 1 << 0, 'S': 1 << 1, 'N': 1 << 2, 'L': 1 << 3, 'B': 1 << 4}
+_GENDER_BIT = {u'\u2642': 1 << 0, u'\u2640': 1 << 1, u'\u26b2': 1 << 2}
+_TEAM_BIT = {0: 1 << 0, 1: 1 << 1, 2: 1 << 2, 3: 1 << 3}
+
+# Maps (FilterType, name, id(default)) to (default, filter) for named filters
+_filter_instance_cache = {}
+
+# Maps each frozenset used by filters to a single shared copy of it
+_frozenset_cache = {}
+
+
+# Maps the type, name and settings of each filter to a single shared filter
+_filter_intern_cache = {}
+
+
+# Returns a shared frozenset with the given values
+def intern_set(values):
+    fs = frozenset(values)
+    return _frozenset_cache.setdefault(fs, fs)
+
+
+# Returns a shared filter identical to the given one (filters aren't modified
+# after they're built, so filters with the same settings can be reused)
+def intern_filter(filt):
+    key = (type(filt), filt.name, tuple(sorted(
+        (k, tuple(v) if isinstance(v, list) else v)
+        for k, v in filt.to_dict().iteritems())))
+    return _filter_intern_cache.setdefault(key, filt)
+
+
+# Returns the filter built from a named filter, reusing it if already built
+def get_named_filter(location, FilterType, name, default):
+    key = (FilterType, name, id(default))
+    cached = _filter_instance_cache.get(key)
+    # Check the default is the same object in case its id was reused
+    if cached is not None and cached[0] is default:
+        return cached[1]
+    filt = FilterType(named_filters[name].copy(), default, location)
+    _filter_instance_cache[key] = (default, filt)
+    return filt
+
+
+# Removes and returns a setting, or the default if it wasn't set
+def pop_setting(settings, key, default):
+    val = settings.pop(key, _MISSING)
+    if val is _MISSING or val is None or val == '':
+        return default[key]
+    return val
+
 
 # Check if a filter is a Boolean, a Single Filter, or Multiple Filters
 def create_multi_filter(location, FilterType, settings, default):
-    global named_filters, filter_sets
-
-    bool = parse_boolean(settings)
-    if bool is not None:  # Make a new filter off of one of the defaults
-        if bool is True:
-            return [FilterType({}, default, location)]
+    handler = _FILTER_HANDLERS.get(type(settings))
+    if handler is None:  # Check for subclasses (such as OrderedDict)
+        handler = _create_unknown_filter
+        for type_, type_handler in _FILTER_HANDLERS.iteritems():
+            if isinstance(settings, type_):
+                handler = type_handler
+                break
+    filters = handler(location, FilterType, settings, default)
+    if filters is None:
+        return None
+    return tuple(intern_filter(f) for f in filters)
+
+
+# Make a new filter off of one of the defaults
+def _create_bool_filter(location, FilterType, settings, default):
+    if parse_boolean(settings) is True:
+        return [FilterType({}, default, location)]
+    return None
+
+
+# Single literal filter
+def _create_dict_filter(location, FilterType, settings, default):
+    return [FilterType(settings, default, location)]
+
+
+# Multiple Filters
+def _create_list_filter(location, FilterType, settings, default):
+    rtn = []
+    for filt in settings:
+        if isinstance(filt, dict):
+            # We got a literal filter
+            rtn.append(FilterType(filt, default, location))
+        elif isinstance(filt, basestring) and filt in named_filters:
+            # We got a name for a named filter
+            rtn.append(get_named_filter(location, FilterType, filt, default))
         else:
-            return None
-    elif type(settings) == dict:  # Single literal filter
-        return [FilterType(settings, default, location)]
-    elif isinstance(settings, list):  # Multiple Filters
-        rtn = []
-        for filt in settings:
-            if type(filt) == dict:
-                # We got a literal filter
-                rtn.append(FilterType(filt, default, location))
-            elif isinstance(filt, basestring) and filt in named_filters:
-                # We got a name for a named filter
-                rtn.append(FilterType(named_filters[filt].copy(), default, location))
-            else:
-                log.error("Unknown filter for {}: {}".format(location, str(filt)))
-                raise
-        return rtn
-    elif isinstance(settings, basestring):
-        # We got a name that can either reference a filter set or a named filter.
-        if settings in filter_sets:
-            # We got a name of a filter set - call recursively with the filter set
-            return create_multi_filter(location, FilterType, copy.deepcopy(filter_sets[settings]), default)
-        elif settings in named_filters:
-            # We got a name of a filter - we use it directly
-            return [FilterType(named_filters[settings].copy(), default, location)]
-        log.error("[ {filter1}, {filter2}, {filter3} ] for multiple filters.")
-        log.error("Please check the PokeAlarm documentation "
-                  + "for more information.")
-
-    # All other cases are errors
+            log.error("Unknown filter for {}: {}".format(location, str(filt)))
+            raise
+    return rtn
+
+
+# A boolean or a name that can reference a filter set or a named filter
+def _create_str_filter(location, FilterType, settings, default):
+    if parse_boolean(settings) is not None:
+        return _create_bool_filter(location, FilterType, settings, default)
+    if settings in filter_sets:
+        # We got a name of a filter set - call recursively with the filter set
+        # (shallow copy of each filter since they're consumed on creation)
+        fs = filter_sets[settings]
+        return create_multi_filter(location, FilterType, [f.copy() if isinstance(f, dict) else f for f in fs], default)
+    elif settings in named_filters:
+        # We got a name of a filter - we use it directly
+        return [get_named_filter(location, FilterType, settings, default)]
+    log.error("[ {filter1}, {filter2}, {filter3} ] for multiple filters.")
+    log.error("Please check the PokeAlarm documentation "
+              + "for more information.")
+    return _create_unknown_filter(location, FilterType, settings, default)
+
+
+# All other cases are errors
+def _create_unknown_filter(location, FilterType, settings, default):
     log.error("{} contains filter that is not in the proper format. Accepted formats are: ".format(location))
     log.error("'True' for default filter, 'False' for disabled,")
     log.error("{ ... filter info ...} for a single filter,")
@@ -64,32 +145,48 @@ def create_multi_filter(location, FilterType, settings, default):
     raise
 
 
+# Maps the type of the filter settings to the function used to create it
+_FILTER_HANDLERS = {
+    bool: _create_bool_filter,
+    dict: _create_dict_filter,
+    list: _create_list_filter,
+    str: _create_str_filter,
+    unicode: _create_str_filter
+}
+
+
 def load_filters(settings):
     global named_filters, filter_sets
 
+    # Previously built filters are stale once the definitions are reloaded
+    _filter_instance_cache.clear()
+    _frozenset_cache.clear()
+    _filter_intern_cache.clear()
     named_filters = settings.pop("filters", {})
     # Store filter name in filter for nicer logging output
     for filter_name, filter in named_filters.iteritems():
         filter['name'] = filter_name
 
     filter_sets = {}
+    nf = named_filters
     # Expand filter names to filters in filter sets
     for filter_set_name, filter_set in settings.pop('filter_sets', {}).iteritems():
-        fset_expanded = []
-        for filter in filter_set:
-            if isinstance(filter, basestring) and filter in named_filters:
-                fset_expanded.append(named_filters[filter])
-            elif type(filter) == dict:
-                fset_expanded.append(filter)
-            else:
+        fset_expanded = [None] * len(filter_set)
+        for i, filter in enumerate(filter_set):
+            if isinstance(filter, dict):
+                fset_expanded[i] = filter
+                continue
+            named = nf.get(filter) if isinstance(filter, basestring) else None
+            if named is None:
                 log.error("Unsupported filter set: {} -> {}".format(filter_set_name, str(filter)))
                 raise
+            fset_expanded[i] = named
         filter_sets[filter_set_name] = fset_expanded
 
 
 def load_pokemon_filters(settings):
     # Determine Pokemon defaults - start with ANY filter
-    pkmn_defaults = PokemonFilter.get_defaults()
+    pkmn_defaults = PokemonFilter._DEFAULTS
     user_defaults = settings.pop("default", {})
     if type(user_defaults) == list:
         log.error("Default Pokemon filter cannot be a list '[...]'.")
@@ -117,7 +214,18 @@ def load_pokemon_filters(settings):
         if f is not None:
             filters[pkmn_id] = f
 
-    return filters
+    # Store the filters in a tuple indexed by pokemon id for quick lookups
+    filters_arr = [None] * (max(filters) + 1 if filters else 0)
+    for pkmn_id, f in filters.iteritems():
+        filters_arr[pkmn_id] = PokemonFilterBank(f)
+    return tuple(filters_arr)
+
+
+# Returns the filters set for the given pokemon id (or None if not set)
+def get_pokemon_filters(filters, pkmn_id):
+    if 0 <= pkmn_id < len(filters):
+        return filters[pkmn_id]
+    return None
 
 
 def load_pokemon_section(settings):
@@ -129,10 +237,12 @@ def load_pokemon_section(settings):
     pokemon['filters'] = filters
     # Output filters
     log.debug(filters)
-    for pkmn_id in sorted(filters):
+    for pkmn_id, pkmn_filters in enumerate(filters):
+        if pkmn_filters is None:
+            continue
         log.debug("The following filters are set for #{}:".format(pkmn_id))
-        for i in range(len(filters[pkmn_id])):
-            log.debug("F#{}: ".format(i) + filters[pkmn_id][i].to_string())
+        for i, f in enumerate(pkmn_filters):
+            log.debug("F#{}: ".format(i) + f.to_string())
     if pokemon['enabled'] is False:
         log.info("Pokemon notifications will NOT be sent - Enabled is False.")
     return pokemon
@@ -149,8 +259,8 @@ def load_pokestop_section(settings):
     }
 
     reject_leftover_parameters(settings, "Pokestops section of Filters file.")
-    for i in range(len(stop['filters'])):
-        log.debug("F#{}: ".format(i) + stop['filters'][i].to_string())
+    for i, f in enumerate(stop['filters']):
+        log.debug("F#{}: ".format(i) + f.to_string())
     return stop
 
 
@@ -158,7 +268,7 @@ def load_gym_section(settings):
     log.info("Setting Gym filters...")
     # Set the defaults for "True"
     # Override defaults using a new Filter to verify inputs
-    default_filt = GymFilter(settings.pop('default', {}), GymFilter.get_defaults(), 'default')
+    default_filt = GymFilter(settings.pop('default', {}), GymFilter._DEFAULTS, 'default')
     default = default_filt.to_dict()
     # Create the settings for gyms
     gym = {
@@ -174,22 +284,28 @@ def load_gym_section(settings):
 
     reject_leftover_parameters(settings, 'Gym section of Filters file.')
 
-    for i in range(len(gym['filters'])):
-        log.debug("F#{}: ".format(i) + gym['filters'][i].to_string())
+    for i, f in enumerate(gym['filters']):
+        log.debug("F#{}: ".format(i) + f.to_string())
     if gym['enabled'] is False:
         log.info("Gym notifications will NOT be sent. - Enabled is False  ")
     return gym
 
 
 # Load Egg filter section
+# System defaults for the egg section
+_EGG_DEFAULTS = {
+    "min_level": 0, "max_level": 10, "min_dist": 0.0, "max_dist": float('inf')
+}
+
+
 def load_egg_section(settings):
     log.info("Setting up Egg Filters...")
     egg = {
         "enabled": bool(parse_boolean(settings.pop('enabled', None)) or False),
-        "min_level": int(settings.pop('min_level', 0) or 0),
-        "max_level": int(settings.pop('max_level', 10) or 10),
-        "min_dist": float(settings.pop('min_dist', 0) or 0),
-        "max_dist": float(settings.pop('max_dist', 'inf') or 'inf'),
+        "min_level": int(pop_setting(settings, 'min_level', _EGG_DEFAULTS)),
+        "max_level": int(pop_setting(settings, 'max_level', _EGG_DEFAULTS)),
+        "min_dist": float(pop_setting(settings, 'min_dist', _EGG_DEFAULTS)),
+        "max_dist": float(pop_setting(settings, 'max_dist', _EGG_DEFAULTS)),
         "contains": settings.pop('gymname_contains', []),
         "park_check": bool(parse_boolean(settings.pop('park_check', None)) or False)
     }
@@ -234,25 +350,41 @@ def load_weather_section(settings):
     }
 
     reject_leftover_parameters(settings, "Weather section of Filters file.")
-    for i in range(len(weather['filters'])):
-        log.debug("F#{}: ".format(i) + weather['filters'][i].to_string())
+    for i, f in enumerate(weather['filters']):
+        log.debug("F#{}: ".format(i) + f.to_string())
     return weather
 
+
+# System default filter values, merged at import rather than per call
+_BASE_DEFAULTS = {
+    "min_dist": 0.0, "max_dist": float('inf')
+}
+
+
 # Base filter class. Every filter may contain at least these criteria.
 class Filter(object):
 
+    __slots__ = ('name', 'min_dist', 'max_dist')
+
     def __init__(self, settings, default, location):
         """ Base filter class """
         self.name = settings.pop('name', None)
-        self.min_dist = float(settings.pop('min_dist', None) or default['min_dist'])
-        self.max_dist = float(settings.pop('max_dist', None) or default['max_dist'])
+        self.min_dist = float(pop_setting(settings, 'min_dist', default))
+        self.max_dist = float(pop_setting(settings, 'max_dist', default))
 
     # Returns the system default filter values.
     @staticmethod
     def get_defaults():
-        return {
-            "min_dist": 0.0, "max_dist": float('inf')
-        }
+        return dict(_BASE_DEFAULTS)
+
+    @staticmethod
+    def create_mask(values, bits):  # Combine the bits of the given values
+        if values is None:
+            return None
+        mask = 0
+        for val in values:
+            mask |= bits[val]
+        return mask
 
     # Checks the given distance against this filter
     def check_dist(self, dist):
@@ -264,7 +396,7 @@ class Filter(object):
 
     # Pretty print this filter to a string.
     def to_string(self):
-        defaults = Filter.get_defaults()
+        defaults = Filter._DEFAULTS
         parts = []
         if self.name:
             parts.append("\"{}\":".format(self.name))
@@ -273,45 +405,132 @@ class Filter(object):
         return " ".join(parts)
 
 
+# System defaults are computed once - these must not be modified
+Filter._DEFAULTS = Filter.get_defaults()
+
+
+# Moveset ratings are letters from 'F' (worst) to 'A' (best), ranked as ints
+# so they can be compared without string comparisons
+_RATING_RANK = {'A': 0, 'B': 1, 'C': 2, 'D': 3, 'E': 4, 'F': 5}
+
+
+# Filter flags are booleans where unrecognised values are False
+def _parse_flag(flag):
+    return bool(parse_boolean(flag))
+
+
+def _parse_rating(rating):
+    rating = rating.upper()
+    if rating not in _RATING_RANK:
+        log.error("{} is not a valid moveset rating. ".format(rating)
+                  + "Ratings must be a letter from 'A' to 'F'.")
+        raise
+    return rating
+
+
+_POKEMON_DEFAULTS = dict(_BASE_DEFAULTS, **{
+    "ignore_missing": False,
+    "min_cp": 0, "max_cp": sys.maxint,
+    "min_level": 0, "max_level": 40,
+    "min_iv": 0.0, "max_iv": 100.0,
+    "min_atk": 0, "max_atk": 15,
+    "min_def": 0, "max_def": 15,
+    "min_sta": 0, "max_sta": 15,
+    "quick_move": None, "charge_move": None, "moveset": None,
+    "size": None,
+    "gender": None,
+    "form": None,
+    "min_rating_attack": "F", "max_rating_attack": "A",
+    "min_rating_defense": "F", "max_rating_defense": "A",
+    "mention": None
+})
+
+
 #  Used to determine when Pokemon notifications will be triggered.
 class PokemonFilter(Filter):
 
+    # Fields checked by check_all, the bits used for them in the needs and
+    # have masks and the index of their value are in this order
+    RANGE_FIELDS = ('cp', 'level', 'iv', 'atk', 'def', 'sta',
+                    'rating_attack', 'rating_defense')
+    CP, LEVEL, IV, ATK, DEF, STA, RATING_ATTACK, RATING_DEFENSE = \
+        (1 << i for i in range(len(RANGE_FIELDS)))
+
+    # Settings as (attribute, cast) - the settings use the same keys
+    _FIELDS = (
+        ('ignore_missing', _parse_flag),
+        ('min_cp', int), ('max_cp', int),
+        ('min_level', int), ('max_level', int),
+        ('min_iv', float), ('max_iv', float),
+        ('min_atk', int), ('max_atk', int),
+        ('min_def', int), ('max_def', int),
+        ('min_sta', int), ('max_sta', int),
+        ('min_rating_attack', _parse_rating),
+        ('max_rating_attack', _parse_rating),
+        ('min_rating_defense', _parse_rating),
+        ('max_rating_defense', _parse_rating),
+        ('mention', str)
+    )
+
+    # Labels used by to_string, in the order they are printed
+    _PRETTY_RANGES = (
+        ('min_cp', 'max_cp', "CP: {} to {}"),
+        ('min_level', 'max_level', "Lvl: {} to {}"),
+        ('min_iv', 'max_iv', "IV: {}% to {}%"),
+        ('min_atk', 'max_atk', "Atk: {} to {}"),
+        ('min_def', 'max_def', "Def: {} to {}"),
+        ('min_sta', 'max_sta', "Sta: {} to {}")
+    )
+    _PRETTY_RATINGS = (
+        ('min_rating_attack', 'max_rating_attack', "Rating Atk: {} to {}"),
+        ('min_rating_defense', 'max_rating_defense', "Rating Def: {} to {}")
+    )
+    _PRETTY_SETS = (
+        ('req_quick_move', "Quick Moves: {}"),
+        ('req_charge_move', "Charge Moves: {}"),
+        ('req_moveset', "Move Sets: {}"),
+        ('sizes', "Sizes: {}"),
+        ('genders', "Genders: {}"),
+        ('forms', "Forms: {}")
+    )
+
+    __slots__ = (
+        'ignore_missing', 'min_cp', 'max_cp', 'needs_cp',
+        'min_level', 'max_level', 'needs_level', 'min_iv', 'max_iv',
+        'needs_iv', 'min_atk', 'max_atk', 'needs_atk', 'min_def', 'max_def',
+        'needs_def', 'min_sta', 'max_sta', 'needs_sta', 'sizes', 'genders',
+        'forms', 'req_quick_move', 'req_charge_move', 'req_moveset',
+        'min_rating_attack', 'max_rating_attack', 'needs_rating_attack',
+        'min_rating_defense', 'max_rating_defense', 'needs_rating_defense',
+        'mention', '_sizes_mask', '_genders_mask', '_forms_mask',
+        '_moveset_pairs', '_needs_mask', '_lows', '_highs', '_checks')
+
     def __init__(self, settings, default, location):
         super(PokemonFilter, self).__init__(settings, default, location)
-        pDefaults = PokemonFilter.get_defaults()
-        # Do we ignore pokemon with missing info?
-        self.ignore_missing = bool(parse_boolean(
-            settings.pop('ignore_missing', default['ignore_missing'])))
-        # CP
-        self.min_cp = int(settings.pop('min_cp', None) or default['min_cp'])
-        self.max_cp = int(settings.pop('max_cp', None) or default['max_cp'])
-        self.needs_cp = self.min_cp != pDefaults['min_cp'] or self.max_cp != pDefaults['max_cp']
-        # Level
-        self.min_level = int(settings.pop('min_level', None)
-                             or default['min_level'])
-        self.max_level = int(settings.pop('max_level', None)
-                             or default['max_level'])
-        self.needs_level = self.min_level != pDefaults['min_level'] or self.max_level != pDefaults['max_level']
-        # IVs
-        self.min_iv = float(settings.pop('min_iv', None) or default['min_iv'])
-        self.max_iv = float(settings.pop('max_iv', None) or default['max_iv'])
-        self.needs_iv = self.min_iv != pDefaults['min_iv'] or self.max_iv != pDefaults['max_iv']
-        self.min_atk = int(settings.pop('min_atk', None) or default['min_atk'])
-        self.max_atk = int(settings.pop('max_atk', None) or default['max_atk'])
-        self.needs_atk = self.min_atk != pDefaults['min_atk'] or self.max_atk != pDefaults['max_atk']
-        self.min_def = int(settings.pop('min_def', None) or default['min_def'])
-        self.max_def = int(settings.pop('max_def', None) or default['max_def'])
-        self.needs_def = self.min_def != pDefaults['min_def'] or self.max_def != pDefaults['max_def']
-        self.min_sta = int(settings.pop('min_sta', None) or default['min_sta'])
-        self.max_sta = int(settings.pop('max_sta', None) or default['max_sta'])
-        self.needs_sta = self.min_sta != pDefaults['min_sta'] or self.max_sta != pDefaults['max_sta']
+        pDefaults = PokemonFilter._DEFAULTS
+        # Ignore Missing, CP, Level, IVs, Moveset Ratings and Mention
+        for attr, cast in PokemonFilter._FIELDS:
+            setattr(self, attr, cast(pop_setting(settings, attr, default)))
+        # Ranges that differ from the system defaults need to be checked
+        self._needs_mask = 0
+        for i, field in enumerate(PokemonFilter.RANGE_FIELDS):
+            min_, max_ = 'min_' + field, 'max_' + field
+            needs = getattr(self, min_) != pDefaults[min_] \
+                or getattr(self, max_) != pDefaults[max_]
+            setattr(self, 'needs_' + field, needs)
+            self._needs_mask |= needs << i
         # Size
         self.sizes = PokemonFilter.check_sizes(
             settings.pop("size", default['size']))
         self.genders = PokemonFilter.check_genders(
             settings.pop("gender", default['gender']))
+        self._sizes_mask = PokemonFilter.create_mask(self.sizes, _SIZE_BIT)
+        self._genders_mask = PokemonFilter.create_mask(
+            self.genders, _GENDER_BIT)
         self.forms = PokemonFilter.check_forms(
             settings.pop("form", default['form']))
+        self._forms_mask = None if self.forms is None else \
+            sum(1 << form_id for form_id in self.forms if form_id >= 0)
         # Moves - These can't be set in the default filter
         self.req_quick_move = PokemonFilter.create_moves_list(
             settings.pop("quick_move", default['quick_move']))
@@ -319,42 +538,30 @@ class PokemonFilter(Filter):
             settings.pop("charge_move", default['charge_move']))
         self.req_moveset = PokemonFilter.create_moveset_list(
             settings.pop("moveset", default['moveset']))
-        # Moveset Ratings
-        self.min_rating_attack = (settings.pop('min_rating_attack', None) or default['min_rating_attack']).upper()
-        self.max_rating_attack = (settings.pop('max_rating_attack', None) or default['max_rating_attack']).upper()
-        self.needs_rating_attack = self.min_rating_attack != pDefaults['min_rating_attack'] or self.max_rating_attack != pDefaults['max_rating_attack']
-        self.min_rating_defense = (settings.pop('min_rating_defense', None) or default['min_rating_defense']).upper()
-        self.max_rating_defense = (settings.pop('max_rating_defense', None) or default['max_rating_defense']).upper()
-        self.needs_rating_defense = self.min_rating_defense != pDefaults['min_rating_defense'] or self.max_rating_defense != pDefaults['max_rating_defense']
-        self.mention = str(settings.pop('mention', None) or default['mention'])
+        self._moveset_pairs = PokemonFilter.create_moveset_pairs(
+            self.req_moveset)
+        # Bounds of each field as parallel tuples (ratings are ranked 'A' = 0
+        # to 'F' = 5, so the max rating is the lower bound)
+        self._lows = (
+            self.min_cp, self.min_level, self.min_iv, self.min_atk,
+            self.min_def, self.min_sta,
+            _RATING_RANK[self.max_rating_attack],
+            _RATING_RANK[self.max_rating_defense])
+        self._highs = (
+            self.max_cp, self.max_level, self.max_iv, self.max_atk,
+            self.max_def, self.max_sta,
+            _RATING_RANK[self.min_rating_attack],
+            _RATING_RANK[self.min_rating_defense])
+        # Only the needed ranges, as (bit, (index, low, high)) with the
+        # bounds bound so check_all doesn't have to look them up
+        self._checks = tuple(
+            (1 << i, (i, self._lows[i], self._highs[i]))
+            for i in range(len(PokemonFilter.RANGE_FIELDS))
+            if self._needs_mask >> i & 1)
 
         reject_leftover_parameters(
             settings, "pokemon filter under '{}'".format(location))
 
-    # Checks the CP against this filter
-    def check_cp(self, cp):
-        return self.min_cp <= cp <= self.max_cp
-
-    # Checks the Level against this filter
-    def check_level(self, level):
-        return self.min_level <= level <= self.max_level
-
-    # Checks the IV percent against this filter
-    def check_iv(self, dist):
-        return self.min_iv <= dist <= self.max_iv
-
-    # Checks the attack IV against this filter
-    def check_atk(self, atk):
-        return self.min_atk <= atk <= self.max_atk
-
-    # Checks the defense IV against this filter
-    def check_def(self, def_):
-        return self.min_def <= def_ <= self.max_def
-
-    # Checks the stamina IV against this filter
-    def check_sta(self, sta):
-        return self.min_sta <= sta <= self.max_sta
-
     # Checks the quick move against this filter
     def check_quick_move(self, move_id):
         if self.req_quick_move is None:
@@ -369,36 +576,54 @@ class PokemonFilter(Filter):
 
     # Checks if this combination of moves is in this filter
     def check_moveset(self, move_1_id, move_2_id):
-        if self.req_moveset is None:
+        if self._moveset_pairs is None:
             return True
-        for filt in self.req_moveset:
-            if move_1_id in filt and move_2_id in filt:
-                return True
-        return False
+        return (move_1_id, move_2_id) in self._moveset_pairs
 
     # Checks the size against this filter
     def check_size(self, size):
-        if self.sizes is None:
-            return True
-        return size in self.sizes
+        return self._sizes_mask is None or \
+            bool(self._sizes_mask & _SIZE_BIT.get(size, 0))
 
     # Checks the gender against this filter
     def check_gender(self, gender):
-        if self.genders is None:
-            return True
-        return gender in self.genders
+        return self._genders_mask is None or \
+            bool(self._genders_mask & _GENDER_BIT.get(gender, 0))
 
     # Checks the form_id against this filter
     def check_form(self, form_id):
-        if self.forms is None:
+        if self._forms_mask is None:
             return True
-        return form_id in self.forms
-
-    def check_rating_attack(self, rating_attack):
-        return self.min_rating_attack >= rating_attack >= self.max_rating_attack
+        return form_id >= 0 and bool(self._forms_mask >> form_id & 1)
 
-    def check_rating_defense(self, rating_defense):
-        return self.min_rating_defense >= rating_defense >= self.max_rating_defense
+    # Returns the rank used by check_all for a rating letter. Unknown ratings
+    # (such as '?' or '-') are returned unchanged.
+    @staticmethod
+    def get_rating_rank(rating):
+        return _RATING_RANK.get(rating, rating)
+
+    # Checks all of the ranges at once. `have_mask` has the bits set for the
+    # values that are known and `values` is ordered the same as the bits,
+    # with the ratings given as ranks from `get_rating_rank`.
+    # Returns None if passed, otherwise the bit of the first failed check
+    # and whether it failed because the information was missing.
+    def check_all(self, have_mask, values):
+        missing = self._needs_mask & ~have_mask
+        if missing and self.ignore_missing is True:
+            return missing & -missing, True
+        for bit, (i, lo, hi) in self._checks:
+            if have_mask & bit and not lo <= values[i] <= hi:
+                return bit, False
+        return None
+
+    # Packs the range checks of the given filters into a tuple of
+    # (needs_mask, ignore_missing, checks) per filter, which a
+    # `PokemonFilterBank` walks to match a sighting against all of them.
+    # Should be rebuilt whenever the filters are reloaded.
+    @staticmethod
+    def compile_batch(filters):
+        return tuple((f._needs_mask, f.ignore_missing is True, f._checks)
+                     for f in filters)
 
     # Checks for an @mention
     def check_mention(self):
@@ -433,39 +658,19 @@ class PokemonFilter(Filter):
 
     # Print this filter
     def to_string(self):
-        defaults = PokemonFilter.get_defaults()
+        defaults = PokemonFilter._DEFAULTS
         parts = []
         name_or_dist = super(PokemonFilter, self).to_string()
         if name_or_dist:
             parts.append(name_or_dist)
-        if self.min_cp != defaults["min_cp"] or self.max_cp != defaults["max_cp"]:
-            parts.append("CP: {} to {}".format(self.min_cp, self.max_cp))
-        if self.min_level != defaults["min_level"] or self.max_level != defaults["max_level"]:
-            parts.append("Lvl: {} to {}".format(self.min_level, self.max_level))
-        if self.min_iv != defaults["min_iv"] or self.max_iv != defaults["max_iv"]:
-            parts.append("IV: {}% to {}%".format(self.min_iv, self.max_iv))
-        if self.min_atk != defaults["min_atk"] or self.max_atk != defaults["max_atk"]:
-            parts.append("Atk: {} to {}".format(self.min_atk, self.max_atk))
-        if self.min_def != defaults["min_def"] or self.max_def != defaults["max_def"]:
-            parts.append("Def: {} to {}".format(self.min_def, self.max_def))
-        if self.min_sta != defaults["min_sta"] or self.max_sta != defaults["max_sta"]:
-            parts.append("Sta: {} to {}".format(self.min_sta, self.max_sta))
-        if self.req_quick_move is not None:
-            parts.append("Quick Moves: {}".format(self.req_quick_move))
-        if self.req_charge_move is not None:
-            parts.append("Charge Moves: {}".format(self.req_charge_move))
-        if self.req_moveset is not None:
-            parts.append("Move Sets: {}".format(self.req_moveset))
-        if self.sizes is not None:
-            parts.append("Sizes: {}".format(self.sizes))
-        if self.genders is not None:
-            parts.append("Genders: {}".format(self.genders))
-        if self.forms is not None:
-            parts.append("Forms: {}".format(self.forms))
-        if self.min_rating_attack != defaults['min_rating_attack'] or self.max_rating_attack != defaults['max_rating_attack']:
-            parts.append("Rating Atk: {} to {}".format(self.min_rating_attack, self.max_rating_attack))
-        if self.min_rating_defense != defaults['min_rating_defense'] or self.max_rating_defense != defaults['max_rating_defense']:
-            parts.append("Rating Def: {} to {}".format(self.min_rating_defense, self.max_rating_defense))
+        for min_, max_, fmt in PokemonFilter._PRETTY_RANGES:
+            self._append_range(parts, defaults, min_, max_, fmt)
+        for attr, fmt in PokemonFilter._PRETTY_SETS:
+            val = getattr(self, attr)
+            if val is not None:
+                parts.append(fmt.format(val))
+        for min_, max_, fmt in PokemonFilter._PRETTY_RATINGS:
+            self._append_range(parts, defaults, min_, max_, fmt)
         if self.mention is not None:
             parts.append("Mention: {}".format(self.mention))
         if self.ignore_missing != defaults["ignore_missing"]:
@@ -474,40 +679,30 @@ class PokemonFilter(Filter):
             parts.append("any")
         return ", ".join(parts)
 
+    # Adds a range to the given parts if it differs from the system defaults
+    def _append_range(self, parts, defaults, min_, max_, fmt):
+        lo, hi = getattr(self, min_), getattr(self, max_)
+        if lo != defaults[min_] or hi != defaults[max_]:
+            parts.append(fmt.format(lo, hi))
+
     @staticmethod
     def get_defaults():
-        rtn = super(PokemonFilter, PokemonFilter).get_defaults()
-        rtn.update({
-            "ignore_missing": False,
-            "min_cp": 0, "max_cp": sys.maxint,
-            "min_level": 0, "max_level": 40,
-            "min_iv": 0.0, "max_iv": 100.0,
-            "min_atk": 0, "max_atk": 15,
-            "min_def": 0, "max_def": 15,
-            "min_sta": 0, "max_sta": 15,
-            "quick_move": None, "charge_move": None, "moveset": None,
-            "size": None,
-            "gender": None,
-            "form": None,
-            "min_rating_attack": "F", "max_rating_attack": "A",
-            "min_rating_defense": "F", "max_rating_defense": "A",
-            "mention": None
-        })
-        return rtn
+        return dict(_POKEMON_DEFAULTS)
 
     @staticmethod
     def create_moves_list(moves):
         # no moves or already defined moves
-        if moves is None or type(moves) == set:
+        if moves is None or isinstance(moves, frozenset):
             return moves
+        if isinstance(moves, set):
+            return intern_set(moves)
         if type(moves) != list:
             log.error("Moves list must be in a comma seperated array. "
                       + "Ex: [\"Move\",\"Move\"]. Please see PokeAlarm "
                       + "documentation for more examples.")
             raise
         list_ = set()
-        for move_name in moves:
-            move_id = get_move_id(move_name)
+        for move_name, move_id in zip(moves, get_move_ids(moves)):
             if move_id is not None:
                 list_.add(move_id)
             else:
@@ -515,7 +710,7 @@ class PokemonFilter(Filter):
                           + "Please see documentation for accepted move "
                           + "names and correct your Filters file.")
                 raise
-        return list_
+        return intern_set(list_)
 
     @staticmethod
     def create_moveset_list(moves):
@@ -523,64 +718,48 @@ class PokemonFilter(Filter):
             return None
         list_ = []
         for moveset in moves:
-            list_.append(PokemonFilter.create_moves_list(moveset.split('/')))
+            if isinstance(moveset, basestring):
+                moveset = moveset.split('/')
+            list_.append(PokemonFilter.create_moves_list(moveset))
         return list_
 
+    @staticmethod
+    def create_moveset_pairs(movesets):  # Every allowed pair of moves
+        if movesets is None:  # no moveset
+            return None
+        return intern_set((move_1_id, move_2_id) for moveset in movesets
+                          for move_1_id in moveset for move_2_id in moveset)
+
     @staticmethod
     def check_sizes(sizes):
         if sizes is None:  # no sizes
             return None
         list_ = set()
         valid_sizes = ['T', 'S', 'N', 'L', 'B']
-        for raw_size in sizes:
-            size = raw_size
-            if size in valid_sizes:
-                if size == 'T':
-                    list_.add('T')
-                if size == 'S':
-                    list_.add('S')
-                if size == 'N':
-                    list_.add('N')
-                if size == 'L':
-                    list_.add('L')
-                if size == 'B':
-                    list_.add('B')
-            else:
+        for size in sizes:
+            if size not in valid_sizes:
                 log.error("{} is not a valid size name.".format(size))
                 log.error("Please use one of the following: "
                           + "{}".format(valid_sizes))
                 raise
-        return list_
+            list_.add(intern(str(size)))
+        return intern_set(list_)
 
     @staticmethod
     def check_genders(genders):
         if genders is None:  # no genders
             return None
         list_ = set()
-        valid_genders = ['M', 'F', 'N']
         for raw_gender in genders:
-            log.debug("raw_gender: {}".format(raw_gender))
-            gender = raw_gender
-            if raw_gender == u'\u2642':
-                gender = 'M'
-            if raw_gender == u'\u2640':
-                gender = 'F'
-            if raw_gender == u'\u26b2':
-                gender = 'N'
-            log.debug("gender: {}".format(gender))
-            if gender in valid_genders:
-                if gender == 'M':
-                    list_.add(u'\u2642')
-                if gender == 'F':
-                    list_.add(u'\u2640')
-                if gender == 'N':
-                    list_.add(u'\u26b2')
-            else:
+            # Accept both the symbol and the letter for each gender
+            gender = _GLYPH_TO_WORD.get(raw_gender, raw_gender)
+            if gender not in _WORD_TO_GLYPH:
                 log.error("{} is not a valid gender name.".format(gender))
                 log.error("Please use one of the following: "
-                          + "{}".format(valid_genders))
+                          + "{}".format(sorted(_WORD_TO_GLYPH)))
                 raise
-        return list_
+            list_.add(_WORD_TO_GLYPH[gender])
+        return intern_set(list_)
 
     @staticmethod
     def check_forms(forms):
@@ -594,12 +773,66 @@ class PokemonFilter(Filter):
                 log.error("{} is not a valid form.".format(form_id))
                 log.error("Please use an integer to represent form filters.")
                 raise
-        return list_
+        return intern_set(list_)
+
+
+PokemonFilter._DEFAULTS = PokemonFilter.get_defaults()
+
+
+# The filters set for a single pokemon, with their range checks compiled so
+# a sighting can be matched against all of them at once.
+class PokemonFilterBank(list):
+
+    __slots__ = ('batch', '_strict_groups', '_dist_ranges')
+
+    def __init__(self, filters):
+        super(PokemonFilterBank, self).__init__(filters)
+        self.batch = PokemonFilter.compile_batch(self)
+        self._build_strict_groups()
+        self._dist_ranges = tuple((f.min_dist, f.max_dist) for f in self)
+
+    # Groups the filters that ignore missing values by the values they need
+    def _build_strict_groups(self):
+        groups = {}
+        for i, (needs_mask, ignore, _) in enumerate(self.batch):
+            if ignore and needs_mask:
+                groups.setdefault(needs_mask, []).append(i)
+        self._strict_groups = tuple(
+            (mask, tuple(idxs)) for mask, idxs in sorted(groups.items()))
+
+    # Returns a dict of the indexes of the filters rejecting a sighting for
+    # missing values, mapped to the bit of the first missing value
+    def missing_rejections(self, have_mask):
+        rejected = {}
+        for needs_mask, idxs in self._strict_groups:
+            missing = needs_mask & ~have_mask
+            if missing:
+                bit = missing & -missing
+                for i in idxs:
+                    rejected[i] = bit
+        return rejected
+
+    # Yields the (ascending) indexes of the filters whose distance and ranges
+    # pass for the sighting, checking each filter when it's asked for
+    def range_matches(self, have_mask, values, dist):
+        ranges = self._dist_ranges
+        for i, (needs_mask, ignore, checks) in enumerate(self.batch):
+            if dist != 'unkn' and not ranges[i][0] <= dist <= ranges[i][1]:
+                continue
+            if ignore and needs_mask & ~have_mask:
+                continue
+            for bit, (j, lo, hi) in checks:
+                if have_mask & bit and not lo <= values[j] <= hi:
+                    break
+            else:
+                yield i
 
 
 # Pokestop Filter determines when Pokestop notifications will be triggered.
 class PokestopFilter(Filter):
 
+    __slots__ = ()
+
     def __init__(self, settings, default, location):
         super(PokestopFilter, self).__init__(settings, default, location)
 
@@ -607,27 +840,37 @@ class PokestopFilter(Filter):
                                    + "{}".format(location))
 
 
+# Team sets are frozen so they can be shared between filters
+_GYM_DEFAULTS = dict(_BASE_DEFAULTS, **{
+    "to_team": frozenset({0, 1, 2, 3}), "from_team": frozenset({0, 1, 2, 3})
+})
+
+
 # GymFilter is used to determine when Gym notifications will be triggered.
 class GymFilter(Filter):
 
+    __slots__ = ('to_team', 'from_team', '_to_mask', '_from_mask')
+
     def __init__(self, settings, default, location):
         super(GymFilter, self).__init__(settings, default, location)
 
         # Check for 'To Team' list
         self.to_team = GymFilter.create_team_list(settings.pop('to_team'))  \
-            if 'to_team' in settings else default['to_team'].copy()
+            if 'to_team' in settings else default['to_team']
         # Check for 'From Team' list
         self.from_team = GymFilter.create_team_list(settings.pop('from_team'))\
-            if 'from_team' in settings else default['to_team'].copy()
+            if 'from_team' in settings else default['from_team']
+        self._to_mask = GymFilter.create_mask(self.to_team, _TEAM_BIT)
+        self._from_mask = GymFilter.create_mask(self.from_team, _TEAM_BIT)
 
         reject_leftover_parameters(settings, "Gym filter in "
                                    + "{}".format(location))
 
     def check_from_team(self, team_id):
-        return team_id in self.from_team
+        return bool(self._from_mask & _TEAM_BIT.get(team_id, 0))
 
     def check_to_team(self, team_id):
-        return team_id in self.to_team
+        return bool(self._to_mask & _TEAM_BIT.get(team_id, 0))
 
     def to_dict(self):
         rtn = super(GymFilter, self).to_dict()
@@ -646,11 +889,7 @@ class GymFilter(Filter):
 
     @staticmethod
     def get_defaults():
-        rtn = super(GymFilter, GymFilter).get_defaults()
-        rtn.update({
-            "to_team": {0, 1, 2, 3}, "from_team": {0, 1, 2, 3}
-        })
-        return rtn
+        return dict(_GYM_DEFAULTS)
 
     @staticmethod
     def create_team_list(settings):  # Create a set of Team ID #'s
@@ -668,11 +907,17 @@ class GymFilter(Filter):
                           + "Please see documentation for accepted team "
                           + "names and correct your Filters file.")
                 raise
-        return s
+        return intern_set(s)
+
+
+GymFilter._DEFAULTS = GymFilter.get_defaults()
+
 
 # Pokestop Filter determines when Pokestop notifications will be triggered.
 class WeatherFilter(Filter):
 
+    __slots__ = ()
+
     def __init__(self, settings, default, location):
         super(WeatherFilter, self).__init__(settings, default, location)
 
@@ -8,6 +8,11 @@ import traceback
 
 log = logging.getLogger('Geofence')
 
+# Polygons with at least this many edges are split into horizontal bands
+BAND_MIN_EDGES = 32
+# Average number of edges in each band
+EDGES_PER_BAND = 8
+
 
 # Load in a geofence file
 def load_geofence_file(file_path):
@@ -69,6 +74,32 @@ class Geofence(object):
             self.__min_y = min(p[1], self.__min_y)
             self.__max_y = max(p[1], self.__max_y)
 
+        # Precompute the edges the raycast can hit, as (min y, max y, max x,
+        # x1, y1, x2 - x1, y2 - y1). Horizontal edges can never be hit.
+        edges = []
+        n = len(points)
+        for i in range(n):
+            p1x, p1y = points[i]
+            p2x, p2y = points[(i + 1) % n]
+            if p1y != p2y:
+                edges.append((min(p1y, p2y), max(p1y, p2y), max(p1x, p2x),
+                              p1x, p1y, p2x - p1x, p2y - p1y))
+        self.__edges = tuple(edges)
+
+        # Split big polygons into bands of equal height, each holding the
+        # edges that span it, so the raycast only tries the edges near y
+        self.__bands = None
+        if len(edges) >= BAND_MIN_EDGES:
+            self.__band_count = len(edges) // EDGES_PER_BAND
+            self.__band_height = \
+                (self.__max_y - self.__min_y) / self.__band_count
+            bands = [[] for _ in range(self.__band_count)]
+            for edge in edges:
+                for i in range(self.get_band(edge[0]),
+                               self.get_band(edge[1]) + 1):
+                    bands[i].append(edge)
+            self.__bands = tuple(tuple(band) for band in bands)
+
     # Returns True if the point at the given X, Y
     # is inside the polygon, else false
     def contains(self, x, y):
@@ -79,19 +110,25 @@ class Geofence(object):
 
         # If it is inside the boundary box, use a raycast
         # from the line and toggle for every edge it hits
+        edges = self.__edges
+        if self.__bands is not None:
+            edges = self.__bands[self.get_band(y)]
         inside = False
-        p1x, p1y = self.__points[0]
-        n = len(self.__points)
-        for i in range(1, n + 1):
-            p2x, p2y = self.__points[i % n]
-            if min(p1y, p2y) < y <= max(p1y, p2y) and x <= max(p1x, p2x):
-                if p1y != p2y:
-                    xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                if p1x == p2x or x <= xinters:
-                    inside = not inside
-            p1x, p1y = p2x, p2y
+        for lo_y, hi_y, hi_x, p1x, p1y, dx, dy in edges:
+            if lo_y < y <= hi_y and x <= hi_x \
+                    and x <= (y - p1y) * dx / dy + p1x:
+                inside = not inside
         return inside
 
+    # Returns the index of the band that holds the given Y (inside the box)
+    def get_band(self, y):
+        return min(int((y - self.__min_y) / self.__band_height),
+                   self.__band_count - 1)
+
+    # Returns the boundary box of this geofence as (min_x, min_y, max_x, max_y)
+    def get_bbox(self):
+        return self.__min_x, self.__min_y, self.__max_x, self.__max_y
+
     # Returns the name of this geofence
     def get_name(self):
         return self.__name
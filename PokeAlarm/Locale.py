@@ -2,88 +2,103 @@
 
 # Standard Library Imports
 import os
-import json
 import logging
 # 3rd Party Imports
+try:  # ujson parses the locale files faster, but isn't required
+    import ujson as json
+except ImportError:
+    import json
 # Local Imports
 from Utils import get_path
 
 log = logging.getLogger('Locale')
 
+# Maps (path, mtime) to the parsed locale files - these must not be modified
+_json_cache = {}
+
+
+# Returns the parsed json file, only reading it again if it was modified
+def _load_json_cached(path):
+    key = (path, os.stat(path).st_mtime)
+    if key not in _json_cache:
+        with open(path) as f:
+            _json_cache[key] = json.load(f)
+    return _json_cache[key]
+
+
+# Maps the int IDs of the defaults to their names, preferring the overrides
+def _merge_ids(defaults, overrides):
+    return {int(id_): overrides.get(id_, val)
+            for id_, val in defaults.iteritems()}
+
+
+# Merges the names in the given section of the locale over the defaults
+def _merge_names(default, info, section):
+    return _merge_ids(default[section], info.get(section, {}))
+
 
 # Locale object is used to get different translations in other languages
 class Locale(object):
 
+    # Weather ID -> Emoji
+    _WEATHER_EMOJIS = {
+        1: u"☀️",
+        2: u"☔️",
+        3: u"⛅",
+        4: u"☁️",
+        5: u"💨",
+        6: u"⛄️",
+        7: u"🌁",
+        11: u"🌙",
+        13: u"☁️"
+    }
+
     # Load in the locale information from the specified json file
     def __init__(self, language):
         # Load in English as the default
-        with open(os.path.join(get_path('locales'), 'en.json')) as f:
-            default = json.loads(f.read())
+        default = _load_json_cached(
+            os.path.join(get_path('locales'), 'en.json'))
         # Now load in the actual language we want
         # (unnecessary for English but we don't want to discriminate)
-        with open(os.path.join(
-                get_path('locales'), '{}.json'.format(language))) as f:
-            info = json.loads(f.read())
+        info = _load_json_cached(os.path.join(
+            get_path('locales'), '{}.json'.format(language)))
 
         # Pokemon ID -> Name
-        self.__pokemon_names = {}
-        pokemon = info.get("pokemon", {})
-        for id_, val in default["pokemon"].iteritems():
-            self.__pokemon_names[int(id_)] = pokemon.get(id_, val)
+        self.__pokemon_names = _merge_names(default, info, "pokemon")
 
         # Move ID -> Name
-        self.__move_names = {}
-        moves = info.get("moves", {})
-        for id_, val in default["moves"].iteritems():
-            self.__move_names[int(id_)] = moves.get(id_, val)
+        self.__move_names = _merge_names(default, info, "moves")
 
         # Team ID -> Name
-        self.__team_names = {}
-        teams = info.get("teams", {})
-        for id_, val in default["teams"].iteritems():
-            self.__team_names[int(id_)] = teams.get(id_, val)
+        self.__team_names = _merge_names(default, info, "teams")
 
         # Team ID -> Team Leaders
-        self.__leader_names = {}
-        leaders = info.get("leaders", {})
-        for id_, val in default["leaders"].iteritems():
-            self.__leader_names[int(id_)] = leaders.get(id_, val)
+        self.__leader_names = _merge_names(default, info, "leaders")
 
-        # Pokemon ID -> { Form ID -> Form Name)
+        # Pokemon ID -> { Form ID -> Form Name) - built as each is requested
+        self.__default_forms = default["forms"]
+        self.__info_forms = info.get("forms", {})
         self.__form_names = {}
-        all_forms = info.get("forms", {})
-        for pkmn_id, forms in default["forms"].iteritems():
-            self.__form_names[int(pkmn_id)] = {}
-            pkmn_forms = all_forms.get(pkmn_id, {})
-            for form_id, form_name in forms.iteritems():
-                self.__form_names[int(pkmn_id)][int(form_id)] = pkmn_forms.get(
-                    form_id, form_name)
         log.debug("Loaded '{}' locale successfully!".format(language))
 
         # Weather ID -> Weather Name
-        self.__weather_names = {}
-        wnames = info.get("weather_names", {})
-        for id_,val in default["weather_names"].iteritems():
-            self.__weather_names[int(id_)] = wnames.get(id_, val)
+        self.__weather_names = _merge_names(default, info, "weather_names")
 
-        # Weather ID -> Weather Name
-        self.__display_levels = {}
-        dlevels = info.get("display_levels", {})
-        for id_,val in default["display_levels"].iteritems():
-            self.__display_levels[int(id_)] = dlevels.get(id_, val)
+        # Weather Level -> Display Name
+        self.__display_levels = _merge_names(default, info, "display_levels")
 
-        # Weather ID -> Weather Name
-        self.__severity_names = {}
-        snames = info.get("severity_names", {})
-        for id_,val in default["severity_names"].iteritems():
-            self.__severity_names[int(id_)] = snames.get(id_, val)
+        # Severity ID -> Severity Name
+        self.__severity_names = _merge_names(default, info, "severity_names")
 
-        # Weather ID -> Weather Name
-        self.__world_times = {}
-        wnames = info.get("world_times", {})
-        for id_,val in default["world_times"].iteritems():
-            self.__world_times[int(id_)] = wnames.get(id_, val)
+        # World Time ID -> Time Name
+        self.__world_times = _merge_names(default, info, "world_times")
+
+        # (Weather ID, Time ID) -> Pokemon Weather Texts - built as requested
+        self.__pokemon_weather = {}
 
+        # (Weather ID, Severity ID, Time ID) -> Weather Alert Texts - built
+        # as requested
+        self.__weather_alerts = {}
 
     # Returns the name of the Pokemon associated with the given ID
     def get_pokemon_name(self, pokemon_id):
@@ -103,7 +118,13 @@ class Locale(object):
 
     # Returns the name of the form of for the given Pokemon ID and Form ID
     def get_form_name(self, pokemon_id, form_id):
-        return self.__form_names.get(pokemon_id, {}).get(form_id, '')
+        forms = self.__form_names.get(pokemon_id)
+        if forms is None:
+            key = str(pokemon_id)
+            forms = self.__form_names[pokemon_id] = _merge_ids(
+                self.__default_forms.get(key, {}),
+                self.__info_forms.get(key, {}))
+        return forms.get(form_id, '')
 
     # Returns the name of the weather of for the given weather ID
     def get_weather_name(self, weather_id):
@@ -123,15 +144,48 @@ class Locale(object):
 
     # Returns the emoji of the weather condition
     def get_weather_emoji(self, weather_id):
-        emojis = {
-            1: u"☀️",
-            2: u"☔️",
-            3: u"⛅",
-            4: u"☁️",
-            5: u"💨",
-            6: u"⛄️",
-            7: u"🌁",
-            11: u"🌙",
-            13: u"☁️"
-        }
-        return emojis.get(weather_id, '')
+        return Locale._WEATHER_EMOJIS.get(weather_id, '')
+
+    # Returns the (name, emoji, dynamic emoji) shown for a pokemon spawned in
+    # the given weather at the given time of day
+    def get_pokemon_weather(self, weather_id, time_id):
+        key = (weather_id, time_id)
+        texts = self.__pokemon_weather.get(key)
+        if texts is None:
+            emoji = self.get_weather_emoji(weather_id)
+            dynemoji = emoji
+            # Clear and partly cloudy have their own emojis at night
+            if time_id == 2 and (weather_id == 1 or weather_id == 3):
+                dynemoji = self.get_weather_emoji(weather_id + 10)
+            name = self.get_weather_name(weather_id)
+            if name == 'None':
+                name = ''
+            else:
+                name = '[' + dynemoji + ' ' + name + ']\n'
+            texts = self.__pokemon_weather[key] = (name, emoji, dynemoji)
+        return texts
+
+    # Returns the (name, emoji, severity name, icon, dynamic name, dynamic
+    # emoji) shown for a change to the given weather at the given time of day
+    def get_weather_alert(self, weather_id, severity, time_id):
+        key = (weather_id, severity, time_id)
+        texts = self.__weather_alerts.get(key)
+        if texts is None:
+            name = self.get_weather_name(weather_id)
+            emoji = self.get_weather_emoji(weather_id)
+            severity_name = self.get_severity_name(severity)
+            # Clear and partly cloudy have their own icons and emojis at night
+            if time_id == 2 and (weather_id == 1 or weather_id == 3):
+                icon = self.get_weather_name(weather_id + 10)
+                dynemoji = self.get_weather_emoji(weather_id + 10)
+            else:
+                icon = name
+                dynemoji = emoji
+            if severity >= 1:  # Severity Alert
+                icon = severity_name
+                dynname = severity_name + ' Alert'
+            else:  # Regular Alert
+                dynname = dynemoji + ' ' + name
+            texts = self.__weather_alerts[key] = (
+                name, emoji, severity_name, icon, dynname, dynemoji)
+        return texts
@@ -1,6 +1,4 @@
 # Standard Library Imports
-import Queue
-import json
 import logging
 import multiprocessing
 import os
@@ -8,24 +6,34 @@ import re
 import sys
 import time
 import traceback
-from datetime import datetime, timedelta
+from datetime import datetime
 from threading import Thread
 
 import gevent
+from gevent.queue import Queue
 # 3rd Party Imports
 import gipc
+try:  # pyinotify lets changed config files be detected without polling
+    import pyinotify
+except ImportError:
+    pyinotify = None
+try:  # rtree finds the geofences around a point faster, but isn't required
+    from rtree.index import Index as RTreeIndex
+except ImportError:
+    RTreeIndex = None
 
 from Alarms import alarm_factory
 from Cache import cache_factory
 from Filters import load_pokemon_section, load_pokestop_section, \
     load_gym_section, load_egg_section, load_raid_section, load_weather_section, \
-    load_filters
+    load_filters, get_pokemon_filters, PokemonFilter
 from Geofence import load_geofence_file
 from Locale import Locale
 from LocationServices import location_service_factory
-from Utils import get_cardinal_dir, get_dist_as_str, get_earth_dist, get_path,\
-    get_time_as_str, require_and_remove_key, parse_boolean, contains_arg, \
-    get_pokemon_cp_range, degrees_to_cardinal, get_pkmn_name
+from Utils import get_cardinal_dir_to, get_dist_as_str, get_earth_dist_to, \
+    get_earth_origin, get_path, get_time_as_str, require_and_remove_key, \
+    parse_boolean, load_json_file, get_pokemon_cp_range, degrees_to_cardinal, \
+    get_pkmn_name, is_plain_decimal
 # Local Imports
 from . import config
 
@@ -41,6 +49,48 @@ from pgoapi.protos.pogoprotos.networking.responses.get_map_objects_response_pb2
 
 log = logging.getLogger('Manager')
 
+# Checks run on each PokemonFilter after the ranges, in order, as (pokemon
+# keys, value when missing, check method, filter attribute that requires the
+# value to be known (or None if it can be missing), label, log the value).
+# The single bit tests come first, ahead of the move lookups.
+ATTRIBUTE_CHECKS = (
+    (('form_id',), '?', 'check_form', None, "Form", True),
+    (('gender',), 'unknown', 'check_gender', 'genders', "Gender", True),
+    (('size',), 'unknown', 'check_size', 'sizes', "Size", True),
+    (('quick_id',), '?', 'check_quick_move', 'req_quick_move', "Quick move",
+     False),
+    (('charge_id',), '?', 'check_charge_move', 'req_charge_move',
+     "Charge move", False),
+    (('quick_id', 'charge_id'), '?', 'check_moveset', 'req_moveset',
+     "Moveset", False)
+)
+
+# Regex for the <dts> names used in an alarm
+DTS_RE = re.compile(r"<(\w+)>")
+
+# Seconds a changed config file must stay unchanged before it is reloaded
+CONFIG_RELOAD_DELAY = 1.0
+
+# Most objects processed from the queue before checking the clocks again
+BATCH_SIZE = 256
+
+# Fewest geofences worth indexing (a short list is quicker to just scan)
+GEOFENCE_INDEX_MIN = 16
+
+# Label and filter attributes to log for each failed PokemonFilter range check
+RANGE_REJECTIONS = {
+    PokemonFilter.CP: ("CP", 'min_cp', 'max_cp'),
+    PokemonFilter.LEVEL: ("Level", 'min_level', 'max_level'),
+    PokemonFilter.IV: ("IV percent", 'min_iv', 'max_iv'),
+    PokemonFilter.ATK: ("Attack IV", 'min_atk', 'max_atk'),
+    PokemonFilter.DEF: ("Defense IV", 'min_def', 'max_def'),
+    PokemonFilter.STA: ("Stamina IV", 'min_sta', 'max_sta'),
+    PokemonFilter.RATING_ATTACK: (
+        "Attack rating", 'min_rating_attack', 'max_rating_attack'),
+    PokemonFilter.RATING_DEFENSE: (
+        "Defense rating", 'min_rating_defense', 'max_rating_defense')
+}
+
 
 class Manager(object):
     def __init__(self, name, google_key, locale, units, timezone, time_limit,
@@ -70,6 +120,7 @@ class Manager(object):
 
         # Location should be [lat, lng] (or None for no location)
         self.__location = None
+        self.__origin = None  # Trig of the location, for distances
         if str(location).lower() != 'none':
             self.set_location(location)
         else:
@@ -89,33 +140,89 @@ class Manager(object):
         self.__raid_settings = {}
         self.__egg_settings = {}
         self.__weather_settings = {}
-        self.load_filter_file(get_path(filter_file))
+        filter_path = get_path(filter_file)
+        self.load_filter_file(filter_path)
 
         # Create the Geofences to filter with from given file
-        self.__geofences = []
+        self.set_geofences([])
+        geofence_path = None
         if str(geofence_file).lower() != 'none':
-            self.__geofences = load_geofence_file(get_path(geofence_file))
+            geofence_path = get_path(geofence_file)
+            self.set_geofences(load_geofence_file(geofence_path))
         # Create the alarms to send notifications out with
         self.__alarms = []
-        self.load_alarms_file(get_path(alarm_file), int(max_attempts))
+        alarm_path = get_path(alarm_file)
+        self.load_alarms_file(alarm_path, int(max_attempts))
         self.__max_attempts = max_attempts
 
         # Initialize the queue and start the process
-        self.__queue = multiprocessing.Queue()
+        self.__reader, self.__writer = gipc.pipe(duplex=False)
+        # Objects waiting to be written down the pipe, so a slow process
+        # never holds up the others
+        self.__outbox = Queue()
+        self.__pipe_lost = False
         self.__event = multiprocessing.Event()
+        self.__qsize = multiprocessing.Value('i', 0)  # Items sent, unread
+        self.__now = datetime.utcnow()  # When the current object was read
         self.__process = None
 
-        # Initialize file watcher threads
+        # Initialize file watcher threads with the resolved file paths
         self.watchercfg = {
-            'Filters': (filter_file, None),
-            'Alarms': (alarm_file, None),
-            'Geofences': (geofence_file, None) if geofence_file else (None, None)
+            'Filters': (filter_path, None),
+            'Alarms': (alarm_path, None),
+            'Geofences': (geofence_path, None)
+        }
+        # Maps cfg_type to the (mtime, time seen) of changes not reloaded yet
+        self.__pending_reload = {}
+
+        # Maps each type of object to the method that processes it
+        self.__handlers = {
+            'pokemon': self.process_pokemon,
+            'pokestop': self.process_pokestop,
+            'gym': self.process_gym_info,
+            'gym_info': self.process_gym_info,
+            'egg': self.process_egg,
+            'raid': self.process_raid,
+            'weather': self.process_weather,
+            'location': self.process_location
         }
         log.info("----------- Manager '{}' ".format(self.__name)
                  + " successfully created.")
 
     # ~~~~~~~~~~~~~~~~~~~~~~~ MAIN PROCESS CONTROL ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
+    # Watch the directories of the config files for writes, or return None if
+    # inotify isn't available and the files need to be polled instead
+    def create_config_notifier(self):
+        if pyinotify is None or not sys.platform.startswith('linux'):
+            log.debug("inotify is unavailable - polling config files.")
+            return None
+        self.__watched_paths = set()
+        self.__config_changed = False
+        watch_manager = pyinotify.WatchManager()
+        mask = pyinotify.IN_CLOSE_WRITE | pyinotify.IN_MOVED_TO
+        for filename, _ in self.watchercfg.itervalues():
+            if str(filename).lower() == 'none':
+                continue
+            path = os.path.abspath(filename)
+            self.__watched_paths.add(path)
+            watch_manager.add_watch(os.path.dirname(path), mask)
+        return pyinotify.Notifier(
+            watch_manager, self.handle_config_event, timeout=0)
+
+    # Flag that one of the config files was written to
+    def handle_config_event(self, event):
+        if event.pathname in self.__watched_paths:
+            self.__config_changed = True
+
+    # Returns True if a config file was written to since the last call
+    def config_files_changed(self):
+        if self.__notifier.check_events(timeout=0):
+            self.__notifier.read_events()
+            self.__notifier.process_events()
+        changed, self.__config_changed = self.__config_changed, False
+        return changed
+
     def check_updated_config_files(self):
         for cfg_type in self.watchercfg:
             filename, tstamp = self.watchercfg[cfg_type]
@@ -128,14 +235,24 @@ class Manager(object):
             if current_mtime != tstamp:
                 # Don't read file on first check.
                 if tstamp is not None:
-                    # Test if file is proper JSON - otherwise it might still be written to
-                    try:
-                        with open(get_path(filename), 'r') as f:
-                            x = json.load(f)
-                    except Exception as e:
-                        log.info(
-                            "File {} changed on disk but an error occurred. Retrying... {}".format(filename, repr(e)))
+                    # Wait for the file to stop changing before reloading it
+                    now = time.time()
+                    pending = self.__pending_reload.get(cfg_type)
+                    if pending is None or pending[0] != current_mtime:
+                        self.__pending_reload[cfg_type] = (current_mtime, now)
                         continue
+                    if now - pending[1] < CONFIG_RELOAD_DELAY:
+                        continue
+                    # Test if file is proper JSON - otherwise it might still be written to
+                    # The parsed contents are handed on so they aren't read twice
+                    x = None
+                    if cfg_type != "Geofences":
+                        try:
+                            x = load_json_file(filename)
+                        except Exception as e:
+                            log.info(
+                                "File {} changed on disk but an error occurred. Retrying... {}".format(filename, repr(e)))
+                            continue
 
                     log.info("File {} changed on disk. Re-reading {}.".format(filename, cfg_type))
                     if cfg_type == "Filters":
@@ -146,32 +263,49 @@ class Manager(object):
                         self.__raid_settings = {}
                         self.__egg_settings = {}
                         self.__weather_settings = {}
-                        if not self.load_filter_file(get_path(filename), startup=False):
+                        if not self.load_filter_file(filename, startup=False,
+                                                     data=x):
                             # Config has errors, retry next time
                             continue
                     elif cfg_type == "Alarms":
                         # Create the alarms to send notifications out with
                         self.__alarms = []
-                        if not self.load_alarms_file(get_path(filename), int(self.__max_attempts)):
+                        # Conect the alarms and send the start up message
+                        if not self.load_alarms_file(filename, int(self.__max_attempts),
+                                                     startup=False, data=x,
+                                                     connect_on_load=True):
                             # Config has errors, retry next time
                             continue
-                        # Conect the alarms and send the start up message
-                        for alarm in self.__alarms:
-                            alarm.connect()
-                            alarm.startup_message()
                     elif cfg_type == "Geofences":
                         try:
                             # Create the Geofences to filter with from given file
-                            self.__geofences = load_geofence_file(get_path(filename))
+                            self.set_geofences(load_geofence_file(filename))
                         except:
                             # Config has errors, retry next time
                             continue
 
+                self.__pending_reload.pop(cfg_type, None)
                 self.watchercfg[cfg_type] = (filename, current_mtime)
 
-    # Update the object into the queue
+    # Queue the object to be sent down the pipe to the process
     def update(self, obj):
-        self.__queue.put(obj)
+        if self.__pipe_lost:
+            return  # The process is gone, so nothing will read it
+        with self.__qsize.get_lock():
+            self.__qsize.value += 1
+        self.__outbox.put(obj)
+
+    # Writes the queued objects down the pipe until the process is gone
+    def feed_pipe(self):
+        while True:
+            obj = self.__outbox.get()
+            try:
+                self.__writer.put(obj)
+            except (gipc.GIPCError, EnvironmentError) as e:
+                log.error("Manager %s can no longer be sent objects: %s",
+                          self.__name, e)
+                self.__pipe_lost = True
+                return
 
     # Get the name of this Manager
     def get_name(self):
@@ -180,7 +314,7 @@ class Manager(object):
     # Tell the process to finish up and go home
     def stop(self):
         log.info("Manager {} shutting down... ".format(self.__name)
-                 + "{} items in queue.".format(self.__queue.qsize()))
+                 + "{} items in queue.".format(self.__qsize.value))
         self.__event.set()
 
     def join(self):
@@ -196,15 +330,20 @@ class Manager(object):
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~ MANAGER LOADING ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-    # Load in a new filters file
-    def load_filter_file(self, file_path, startup=True):
+    # Load in a new filters file, or its already parsed contents
+    def load_filter_file(self, file_path, startup=True, data=None):
         try:
             log.info("Loading Filters from file at {}".format(file_path))
-            with open(file_path, 'r') as f:
-                filters = json.load(f)
-            if type(filters) is not dict:
+            if data is None:
+                data = load_json_file(file_path)
+            filters = data
+            if not isinstance(filters, dict):
                 log.critical("Filters file's must be a JSON object:"
                              + " { \"pokemon\":{...},... }")
+                if startup:
+                    sys.exit(1)
+                else:
+                    return False
 
             # Load in the filter definitions
             load_filters(filters)
@@ -258,12 +397,16 @@ class Manager(object):
         else:
             return False
 
-    def load_alarms_file(self, file_path, max_attempts, startup=True):
+    # Load in a new alarms file, or its already parsed contents. Alarms can be
+    # connected as they're created - at startup that happens in the process
+    def load_alarms_file(self, file_path, max_attempts, startup=True,
+                         data=None, connect_on_load=False):
         log.info("Loading Alarms from the file at {}".format(file_path))
         try:
-            with open(file_path, 'r') as f:
-                alarm_settings = json.load(f)
-            if type(alarm_settings) is not list:
+            if data is None:
+                data = load_json_file(file_path)
+            alarm_settings = data
+            if not isinstance(alarm_settings, list):
                 log.critical("Alarms file must be a list of Alarms objects "
                              + "- [ {...}, {...}, ... {...} ]")
                 if startup:
@@ -271,16 +414,25 @@ class Manager(object):
                 else:
                     return False
             self.__alarms = []
+            alarm_dts = set()
             for alarm in alarm_settings:
                 if parse_boolean(require_and_remove_key(
                         'active', alarm, "Alarm objects in file.")) is True:
-                    self.set_optional_args(str(alarm))
-                    self.__alarms.append(
-                        alarm_factory(alarm, max_attempts, self.__google_key))
+                    used = Manager.collect_dts(alarm)
+                    alarm_dts |= used
+                    self.set_optional_args(used)
+                    alarm = alarm_factory(
+                        alarm, max_attempts, self.__google_key)
+                    if connect_on_load:
+                        alarm.connect()
+                        alarm.startup_message()
+                    self.__alarms.append(alarm)
                 else:
                     log.debug("Alarm not activated: {}".format(alarm['type'])
                               + " because value not set to \"True\"")
             log.info("{} active alarms found.".format(len(self.__alarms)))
+            # The DTS used by any of the alarms' settings
+            self.__alarm_dts = alarm_dts
             return True  # all done
         except ValueError as e:
             log.error("Encountered error while loading Alarms file: "
@@ -305,12 +457,27 @@ class Manager(object):
         else:
             return False
 
+    # Returns the set of DTS names used in the strings of the given settings
+    @staticmethod
+    def collect_dts(settings, used=None):
+        if used is None:
+            used = set()
+        if isinstance(settings, basestring):
+            used.update(DTS_RE.findall(settings))
+        elif isinstance(settings, dict):
+            for val in settings.itervalues():
+                Manager.collect_dts(val, used)
+        elif isinstance(settings, list):
+            for val in settings:
+                Manager.collect_dts(val, used)
+        return used
+
     # Check for optional arguments and enable APIs as needed
-    def set_optional_args(self, line):
+    def set_optional_args(self, used):
         # Reverse Location
         args = {'street', 'street_num', 'address', 'postal', 'neighborhood',
                 'sublocality', 'city', 'county', 'state', 'country'}
-        if contains_arg(line, args):
+        if used & args:
             if self.__loc_service is None:
                 log.critical("Reverse location DTS were detected but "
                              + "no API key was provided!")
@@ -321,7 +488,7 @@ class Manager(object):
 
         # Walking Dist Matrix
         args = {'walk_dist', 'walk_time'}
-        if contains_arg(line, args):
+        if used & args:
             if self.__location is None:
                 log.critical("Walking Distance Matrix DTS were detected but "
                              + " no location was set!")
@@ -338,7 +505,7 @@ class Manager(object):
 
         # Biking Dist Matrix
         args = {'bike_dist', 'bike_time'}
-        if contains_arg(line, args):
+        if used & args:
             if self.__location is None:
                 log.critical("Biking Distance Matrix DTS were detected but "
                              + " no location was set!")
@@ -355,7 +522,7 @@ class Manager(object):
 
         # Driving Dist Matrix
         args = {'drive_dist', 'drive_time'}
-        if contains_arg(line, args):
+        if used & args:
             if self.__location is None:
                 log.critical("Driving Distance Matrix DTS were detected but "
                              + "no location was set!")
@@ -374,10 +541,11 @@ class Manager(object):
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ HANDLE EVENTS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-    # Start it up
+    # Start it up, handing the read end of the pipe to the process
     def start(self):
         self.__process = gipc.start_process(
-            target=self.run, args=(), name=self.__name)
+            target=self.run, args=(self.__reader,), name=self.__name)
+        gevent.spawn(self.feed_pipe)
 
     def setup_in_process(self):
         # Set up signal handlers for graceful exit
@@ -404,76 +572,93 @@ class Manager(object):
             alarm.connect()
             alarm.startup_message()
 
+        # Watch the config files, recording their current modification times
+        self.__notifier = self.create_config_notifier()
+        self.check_updated_config_files()
+
     # Main event handler loop
-    def run(self):
+    def run(self, reader):
         self.setup_in_process()
-        last_clean = datetime.utcnow()
-        last_filecheck = datetime.utcnow()
+        last_clean = time.time()
+        last_filecheck = time.time()
         while True:  # Run forever and ever
+            now = time.time()
 
             # Clean out visited every 5 minutes
-            if datetime.utcnow() - last_clean > timedelta(minutes=5):
+            if now - last_clean > 300:
                 log.debug("Cleaning cache...")
                 self.__cache.clean_and_save()
-                last_clean = datetime.utcnow()
+                last_clean = now
 
             # Check if config files have changed and re-read if necessary.
-            if datetime.utcnow() - last_filecheck > timedelta(seconds=5):
+            if self.__notifier is not None:
+                # Changes waiting to settle are checked again after a delay
+                if self.config_files_changed() or (
+                        self.__pending_reload and
+                        now - last_filecheck > CONFIG_RELOAD_DELAY):
+                    self.check_updated_config_files()
+                    last_filecheck = now
+            elif now - last_filecheck > 5:
                 self.check_updated_config_files()
-                last_filecheck = datetime.utcnow()
-
-            try:  # Get next object to process
-                obj = self.__queue.get(block=True, timeout=5)
-            except Queue.Empty:
-                # Check if the process should exit process
-                if self.__event.is_set():
-                    break
-                # Explict context yield
-                gevent.sleep(0)
-                continue
+                last_filecheck = now
 
+            # Drain a batch of objects before checking the clocks again.
+            # Only the first read waits, the rest take what's already queued
             try:
-                kind = obj['type']
-                log.debug("Processing object {} with id {}".format(
-                    obj['type'], obj['id']))
-                if kind == "pokemon":
-                    self.process_pokemon(obj)
-                elif kind == "pokestop":
-                    self.process_pokestop(obj)
-                elif kind == "gym":
-                    self.process_gym_info(obj)
-                elif kind == "gym_info":
-                    self.process_gym_info(obj)
-                elif kind == 'egg':
-                    self.process_egg(obj)
-                elif kind == "raid":
-                    self.process_raid(obj)
-                elif kind == "weather":
-                    self.process_weather(obj)
-                elif kind == "location":
-                    self.process_location(obj)
-                else:
-                    log.error("!!! Manager does not support "
-                              + "{} objects!".format(kind))
-                log.debug("Finished processing object {} with id {}".format(
-                    obj['type'], obj['id']))
-            except Exception as e:
-                log.error("Encountered error during processing: "
-                          + "{}: {}".format(type(e).__name__, e))
-                log.debug("Stack trace: \n {}".format(traceback.format_exc()))
-            # Explict context yield
+                count = 0
+                for count in xrange(BATCH_SIZE):
+                    obj = None
+                    with gevent.Timeout(0 if count else 5, False) as timeout:
+                        obj = reader.get(timeout=timeout)
+                    if obj is None:
+                        break
+                    # Taken per object, since sending alerts can be slow
+                    self.__now = datetime.utcnow()
+                    with self.__qsize.get_lock():
+                        self.__qsize.value -= 1
+                    self.process_object(obj)
+            except (gipc.GIPCError, EOFError) as e:
+                log.error("Manager {} lost its queue: {}".format(
+                    self.__name, e))
+                break
+            # Check if the process should exit process
+            if count == 0 and obj is None and self.__event.is_set():
+                break
+            # Explict context yield once the batch is done
             gevent.sleep(0)
         # Save cache and exit
         self.__cache.clean_and_save()
         exit(0)
 
+    # Process a single object from the queue
+    def process_object(self, obj):
+        try:
+            kind = obj['type']
+            log.debug("Processing object {} with id {}".format(
+                obj['type'], obj['id']))
+            handler = self.__handlers.get(kind)
+            if handler is None:
+                log.error("!!! Manager does not support "
+                          + "{} objects!".format(kind))
+            else:
+                handler(obj)
+            log.debug("Finished processing object {} with id {}".format(
+                obj['type'], obj['id']))
+        except Exception as e:
+            log.error("Encountered error during processing: "
+                      + "{}: {}".format(type(e).__name__, e))
+            log.debug("Stack trace: \n {}".format(traceback.format_exc()))
+
     # Set the location of the Manager
     def set_location(self, location):
-        # Regex for Lat,Lng coordinate
-        prog = re.compile("^(-?\d+\.\d+)[,\s]\s*(-?\d+\.\d+?)$")
-        res = prog.match(location)
-        if res:  # If location is in a Lat,Lng coordinate
-            self.__location = [float(res.group(1)), float(res.group(2))]
+        parts = location.split(',')
+        if len(parts) != 2:
+            parts = location.split()
+        parts = [part.strip() for part in parts]
+        # If location is in a Lat,Lng coordinate
+        if len(parts) == 2 and is_plain_decimal(parts[0]) \
+                and is_plain_decimal(parts[1]):
+            self.__location = [float(parts[0]), float(parts[1])]
         else:
             if self.__loc_service is None:  # Check if key was provided
                 log.error("Unable to find location coordinates by name - "
@@ -487,12 +672,28 @@ class Manager(object):
                       + "Please check your settings and try again.")
             sys.exit(1)
         else:
+            self.__origin = get_earth_origin(self.__location)
             log.info("Location successfully set to '{},{}'.".format(
                 self.__location[0], self.__location[1]))
 
+    # Set the geofences to filter with, caching their boundary boxes
+    def set_geofences(self, geofences):
+        self.__has_geofences = len(geofences) > 0
+        self.__geofence_bounds = [(gf, gf.get_bbox()) for gf in geofences]
+        # Index the boundary boxes by position in the list, if there are many
+        self.__geofence_index = None
+        if RTreeIndex is not None and len(geofences) >= GEOFENCE_INDEX_MIN:
+            index = RTreeIndex()
+            for i, (gf, bbox) in enumerate(self.__geofence_bounds):
+                index.insert(i, bbox)
+            self.__geofence_index = index
+
     # Check if a given pokemon is active on a filter
     def check_pokemon_filter(self, filters, pkmn, dist):
         passed = False
+        # Looked up once since they're checked for every filter
+        quiet = self.__quiet
+        debug = log.isEnabledFor(logging.DEBUG)
 
         cp = pkmn['cp']
         level = pkmn['level']
@@ -500,265 +701,107 @@ class Manager(object):
         def_ = pkmn['def']
         atk = pkmn['atk']
         sta = pkmn['sta']
-        size = pkmn['size']
-        gender = pkmn['gender']
-        form_id = pkmn['form_id']
         name = pkmn['pkmn']
-        quick_id = pkmn['quick_id']
-        charge_id = pkmn['charge_id']
         rating_attack = pkmn['rating_attack']
         rating_defense = pkmn['rating_defense']
         mention = pkmn['mention']
 
-        for filt_ct in range(len(filters)):
+        # Pack which of the range checked values are known into a mask
+        shown = (cp, level, iv, atk, def_, sta, rating_attack, rating_defense)
+        have_mask = 0
+        for i, val in enumerate(shown):
+            if val not in ('?', '-'):
+                have_mask |= 1 << i
+        values = shown[:6] + (PokemonFilter.get_rating_rank(rating_attack),
+                              PokemonFilter.get_rating_rank(rating_defense))
+        # Filters that need one of the missing values, found once per group
+        missing_rejections = filters.missing_rejections(have_mask)
+        # Range checked values that are missing, to be logged when debugging
+        missing_ranges = ()
+        if debug:
+            missing_ranges = tuple(
+                RANGE_REJECTIONS[1 << i][0].lower()
+                for i in xrange(len(shown)) if not have_mask >> i & 1)
+        # The values for the other checks don't change between filters
+        checks = []
+        for keys, unknown, check, required, label, show in ATTRIBUTE_CHECKS:
+            vals = tuple(pkmn[k] for k in keys)
+            checks.append((vals, unknown in vals, check, required, label,
+                           vals[0] if show else None))
+
+        # Distance and range rejections aren't logged when quiet, so only the
+        # filters passing them need to be looked at (unless any were missing)
+        if quiet is True and not debug and not missing_rejections:
+            candidates = filters.range_matches(have_mask, values, dist)
+        else:
+            candidates = xrange(len(filters))
+
+        for filt_ct in candidates:
             filt = filters[filt_ct]
 
             # Check the distance from the set location
             if dist != 'unkn':
-                if filt.check_dist(dist) is False:
-                    if self.__quiet is False:
-                        log.info(
-                            "{} rejected: distance ({:.2f}) was not in "
-                            "range {:.2f} to {:.2f} (F #{})".format(
-                                name, dist, filt.min_dist,
-                                filt.max_dist, filt_ct))
-                    continue
-            else:
-                log.debug("Filter dist was not checked because"
-                          + " the manager has no location set.")
-
-            # Check the CP of the Pokemon
-            if cp != '?':
-                if not filt.check_cp(cp):
-                    if self.__quiet is False:
-                        log.info(
-                            "{} rejected: CP ({}) not in range "
-                            "{} to {} - (F #{})".format(
-                                name, cp, filt.min_cp,
-                                filt.max_cp, filt_ct))
-                    continue
-            else:
-                if filt.needs_cp and filt.ignore_missing is True:
-                    log.info("{} rejected: CP information was missing - "
-                             "(F #{})".format(name, filt_ct))
-                    continue
-                log.debug("Pokemon 'cp' was not checked "
-                          + "because it was missing.")
-
-            # Check the Level of the Pokemon
-            if level != '?':
-                if not filt.check_level(level):
-                    if self.__quiet is False:
-                        log.info(
-                            "{} rejected: Level ({}) not "
-                            "in range {} to {} - (F #{})".format(
-                                name, level, filt.min_level,
-                                filt.max_level, filt_ct))
-                    continue
-            else:
-                if filt.needs_level and filt.ignore_missing is True:
-                    log.info("{} rejected: Level information was missing "
-                             "- (F #{})".format(name, filt_ct))
-                    continue
-                log.debug("Pokemon 'level' was not checked because "
-                          + "it was missing.")
-
-            # Check the IV percent of the Pokemon
-            if iv != '?':
-                if not filt.check_iv(iv):
-                    if self.__quiet is False:
-                        log.info(
-                            "{} rejected: IV percent ({:.2f}) not in "
-                            "range {:.2f} to {:.2f} - (F #{})".format(
-                                name, iv, filt.min_iv,
-                                filt.max_iv, filt_ct))
-                    continue
-            else:
-                if filt.needs_iv and filt.ignore_missing is True:
-                    log.info("{} rejected: 'IV' information was missing "
-                             "(F #{})".format(name, filt_ct))
-                    continue
-                log.debug("Pokemon IV percent was not checked because "
-                          + "it was missing.")
-
-            # Check the Attack IV of the Pokemon
-            if atk != '?':
-                if not filt.check_atk(atk):
-                    if self.__quiet is False:
-                        log.info(
-                            "{} rejected: Attack IV ({}) not in "
-                            "range {} to {} - (F #{})".format(
-                                name, atk, filt.min_atk,
-                                filt.max_atk, filt_ct))
-
-                    continue
-            else:
-                if filt.needs_atk and filt.ignore_missing is True:
-                    log.info("{} rejected: Attack IV information was missing "
-                             "- (F #{})".format(name, filt_ct))
-                    continue
-                log.debug("Pokemon 'atk' was not checked because "
-                          + "it was missing.")
-
-            # Check the Defense IV of the Pokemon
-            if def_ != '?':
-                if not filt.check_def(def_):
-                    if self.__quiet is False:
-                        log.info(
-                            "{} rejected: Defense IV ({}) not in "
-                            "range {} to {} - (F #{})".format(
-                                name, def_, filt.min_atk,
-                                filt.max_atk, filt_ct))
-                    continue
-            else:
-                if filt.needs_def and filt.ignore_missing is True:
-                    log.info("{} rejected: Defense IV information was missing "
-                             "- (F #{})".format(name, filt_ct))
-                    continue
-                log.debug("Pokemon 'def' was not checked because it "
-                          + "was missing.")
-
-            # Check the Stamina IV of the Pokemon
-            if sta != '?':
-                if not filt.check_sta(sta):
-                    if self.__quiet is False:
-                        log.info(
-                            "{} rejected: Stamina IV ({}) not in range "
-                            "{} to {} - (F #{}).".format(
-                                name, sta, filt.min_sta,
-                                filt.max_sta, filt_ct))
-                    continue
-            else:
-                if filt.needs_sta and filt.ignore_missing is True:
-                    log.info("{} rejected: Stamina IV information was missing"
-                             " - (F #{})".format(name, filt_ct))
-                    continue
-                log.debug("Pokemon 'sta' was not checked because it"
-                          + " was missing.")
-
-            # Check the Quick Move of the Pokemon
-            if quick_id != '?':
-                if not filt.check_quick_move(quick_id):
-                    if self.__quiet is False:
-                        log.info("{} rejected: Quick move was not correct - "
-                                 "(F #{})".format(name, filt_ct))
-                    continue
-            else:
-                if filt.req_quick_move is not None and filt.ignore_missing is True:
-                    log.info("{} rejected: Quick move information was missing"
-                             " - (F #{})".format(name, filt_ct))
-                    continue
-                log.debug("Pokemon 'quick_id' was not checked because "
-                          + "it was missing.")
-
-            # Check the Quick Move of the Pokemon
-            if charge_id != '?':
-                if not filt.check_charge_move(charge_id):
-                    if self.__quiet is False:
-                        log.info("{} rejected: Charge move was not correct - "
-                                 "(F #{})".format(name, filt_ct))
-                    continue
-            else:
-                if filt.req_charge_move is not None and filt.ignore_missing is True:
-                    log.info("{} rejected: Charge move information was missing"
-                             " - (F #{})".format(name, filt_ct))
-                    continue
-                log.debug("Pokemon 'charge_id' was not checked because "
-                          + "it was missing.")
-
-            # Check for a correct move combo
-            if quick_id != '?' and charge_id != '?':
-                if not filt.check_moveset(quick_id, charge_id):
-                    if self.__quiet is False:
-                        log.info("{} rejected: Moveset was not correct - "
-                                 "(F #{})".format(name, filt_ct))
-                    continue
-            else:  # This will probably never happen? but just to be safe...
-                if filt.req_moveset is not None and filt.ignore_missing is True:
-                    log.info("{} rejected: Moveset information was missing - "
-                             " (F #{})".format(name, filt_ct))
-                    continue
-                log.debug("Pokemon 'moveset' was not checked because "
-                          + "it was missing.")
-
-            # Check for a valid size
-            if size != 'unknown':
-                if not filt.check_size(size):
-                    if self.__quiet is False:
-                        log.info("{} rejected: Size ({}) was not correct "
-                                 "- (F #{})".format(name, size, filt_ct))
+                if not filt.min_dist <= dist <= filt.max_dist:
+                    if quiet is False:
+                        log.info("%s rejected: distance (%.2f) was not in "
+                                 "range %.2f to %.2f (F #%s)", name, dist,
+                                 filt.min_dist, filt.max_dist, filt_ct)
                     continue
-            else:
-                if filt.sizes is not None and filt.ignore_missing is True:
-                    log.info("{} rejected: Size information was missing "
-                             "- (F #{})".format(name, filt_ct))
-                    continue
-                log.debug("Pokemon 'size' was not checked because it "
-                          + "was missing.")
+            elif debug:
+                log.debug("Filter dist was not checked because "
+                          "the manager has no location set.")
 
-            # Check for a valid gender
-            if gender != 'unknown':
-                if not filt.check_gender(gender):
-                    if self.__quiet is False:
-                        log.info("{} rejected: Gender ({}) was not correct "
-                                 "- (F #{})".format(name, gender, filt_ct))
-                    continue
+            # Check the CP, Level, IVs and Ratings of the Pokemon
+            if filt_ct in missing_rejections:
+                failed = missing_rejections[filt_ct], True
             else:
-                if filt.genders is not None and filt.ignore_missing is True:
-                    log.info("{} rejected: Gender information was missing "
-                             "- (F #{})".format(name, filt_ct))
-                    continue
-                log.debug("Pokemon 'gender' was not checked because it "
-                          + "was missing.")
-
-            # Check for a valid form
-            if form_id != '?':
-                if not filt.check_form(form_id):
-                    if self.__quiet is False:
-                        log.info("{} rejected: Form ({}) was not correct "
-                                 "- (F #{})".format(name, form_id, filt_ct))
-                    continue
-
-            if rating_attack not in ('?', '-'):
-                if not filt.check_rating_attack(rating_attack):
-                    if self.__quiet is False:
-                        log.info(
-                            "{} rejected: Attack rating ({}) not in range {} to {} - (F #{}).".format(
-                                name, rating_attack, filt.min_rating_attack, filt.max_rating_attack,
-                                filt_ct))
-                    continue
-            else:
-                if filt.needs_rating_attack and filt.ignore_missing is True:
-                    log.info(
-                        "{} rejected: Attack rating information was missing - (F #{})".format(
-                            name, filt_ct))
-                    continue
-                log.debug(
-                    "Pokemon attack rating was not checked because it was missing.")
-
-            if rating_defense not in ('?', '-'):
-                if not filt.check_rating_defense(rating_defense):
-                    if self.__quiet is False:
-                        log.info(
-                            "{} rejected: Defense rating ({}) not in range {} to {} - (F #{}).".format(
-                                name, rating_defense, filt.min_rating_defense, filt.max_rating_defense,
-                                filt_ct))
-                    continue
+                failed = filt.check_all(have_mask, values)
+            if failed is not None:
+                bit, missing = failed
+                label, min_attr, max_attr = RANGE_REJECTIONS[bit]
+                if missing:
+                    log.info("%s rejected: %s information was missing "
+                             "- (F #%s)", name, label, filt_ct)
+                elif quiet is False:
+                    log.info("%s rejected: %s (%s) not in range %s to %s "
+                             "- (F #%s)", name, label,
+                             shown[bit.bit_length() - 1],
+                             getattr(filt, min_attr), getattr(filt, max_attr),
+                             filt_ct)
+                continue
+            for label in missing_ranges:
+                log.debug("Pokemon %s was not checked because it "
+                          "was missing.", label)
+
+            # Check the moves, size, gender and form of the Pokemon
+            for vals, missing, check, required, label, shown_val in checks:
+                if not missing:
+                    if not getattr(filt, check)(*vals):
+                        if quiet is False and shown_val is None:
+                            log.info("%s rejected: %s was not correct - "
+                                     "(F #%s)", name, label, filt_ct)
+                        elif quiet is False:
+                            log.info("%s rejected: %s (%s) was not correct "
+                                     "- (F #%s)", name, label, shown_val,
+                                     filt_ct)
+                        break
+                elif required is not None:
+                    if getattr(filt, required) is not None \
+                            and filt.ignore_missing is True:
+                        log.info("%s rejected: %s information was missing - "
+                                 "(F #%s)", name, label, filt_ct)
+                        break
+                    if debug:
+                        log.debug("Pokemon %s was not checked because it "
+                                  "was missing.", label.lower())
             else:
-                if filt.needs_rating_defense and filt.ignore_missing is True:
-                    log.info(
-                        "{} rejected: Defense rating information was missing - (F #{})".format(
-                            name, filt_ct))
-                    continue
-                log.debug(
-                    "Pokemon defense rating was not checked because it was missing.")
-
-            mention = filt.check_mention()
+                mention = filt.check_mention()
 
-            # Nothing left to check, so it must have passed
-            passed = True
-            log.debug("{} passed filter #{}".format(name, filt_ct))
-            break
+                # Nothing left to check, so it must have passed
+                passed = True
+                if debug:
+                    log.debug("%s passed filter #%s", name, filt_ct)
+                break
 
         return passed, mention
 
@@ -769,21 +812,22 @@ class Manager(object):
 
         if level < settings['min_level']:
             if self.__quiet is False:
-                log.info("Egg {} is less ({}) than min ({}) level, ignore"
-                         .format(egg['id'], level, settings['min_level']))
+                log.info("Egg %s is less (%s) than min (%s) level, ignore",
+                         egg['id'], level, settings['min_level'])
             return False
 
         if level > settings['max_level']:
             if self.__quiet is False:
-                log.info("Egg {} is higher ({}) than max ({}) level, ignore"
-                         .format(egg['id'], level, settings['max_level']))
+                log.info("Egg %s is higher (%s) than max (%s) level, ignore",
+                         egg['id'], level, settings['max_level'])
             return False
 
         if dist != 'unkn':
             if (settings['min_dist'] <= dist <= settings['max_dist']) is False:
                 if self.__quiet is False:
-                    log.info("Egg {} rejected: distance ({:.2f}) was not in range {:.2f} to {:.2f}".format(
-                        egg['id'], dist, settings['min_dist'], settings['max_dist']))
+                    log.info("Egg %s rejected: distance (%.2f) was not in "
+                             "range %.2f to %.2f", egg['id'], dist,
+                             settings['min_dist'], settings['max_dist'])
                 return False
         else:
             log.debug("Egg distance was not checked because the manager has no location set.")
@@ -800,19 +844,19 @@ class Manager(object):
         # Extract some base information
         pkmn_hash = pkmn['id']
         pkmn_id = pkmn['pkmn_id']
-        name = self.__locale.get_pokemon_name(pkmn_id)
 
         # Check for previously processed
         if self.__cache.get_pokemon_expiration(pkmn_hash) is not None:
-            log.debug("{} was skipped because it was previously ".format(name)
-                      + "processed.")
+            log.debug("Pokemon #%s was skipped because it was previously "
+                      "processed.", pkmn_id)
             return
         self.__cache.update_pokemon_expiration(
             pkmn_hash, pkmn['disappear_time'])
+        name = self.__locale.get_pokemon_name(pkmn_id)
 
         # Check the time remaining
         seconds_left = (pkmn['disappear_time']
-                        - datetime.utcnow()).total_seconds()
+                        - self.__now).total_seconds()
         if seconds_left < self.__time_limit:
             if self.__quiet is False:
                 log.info("{} ignored: Only {} seconds remaining.".format(
@@ -820,7 +864,9 @@ class Manager(object):
             return
 
         # Check that the filter is even set
-        if pkmn_id not in self.__pokemon_settings['filters']:
+        filters = get_pokemon_filters(
+            self.__pokemon_settings['filters'], pkmn_id)
+        if filters is None:
             if self.__quiet is False:
                 log.debug("{} ignored: no filters are set".format(name))
             return
@@ -828,11 +874,10 @@ class Manager(object):
         # Extract some useful info that will be used in the filters
 
         lat, lng = pkmn['lat'], pkmn['lng']
-        dist = get_earth_dist([lat, lng], self.__location)
+        dist = self.get_dist(lat, lng)
 
         pkmn['pkmn'] = name
 
-        filters = self.__pokemon_settings['filters'][pkmn_id]
         passed, mention = self.check_pokemon_filter(filters, pkmn, dist)
         # If we didn't pass any filters
         if not passed:
@@ -843,12 +888,13 @@ class Manager(object):
 
         # Check all the geofences
         pkmn['geofence'] = self.check_geofences(name, lat, lng)
-        if len(self.__geofences) > 0 and pkmn['geofence'] == 'unknown':
+        if self.__has_geofences and pkmn['geofence'] == 'unknown':
             log.info("{} rejected: not inside geofence(s)".format(name))
             return
 
         # Finally, add in all the extra crap we waited to calculate until now
-        time_str = get_time_as_str(pkmn['disappear_time'], self.__timezone)
+        time_left, time_12, time_24 = get_time_as_str(
+            pkmn['disappear_time'], self.__timezone)
         iv = pkmn['iv']
         gendername = pkmn['gendername']
         form_id = pkmn['form_id']
@@ -856,76 +902,60 @@ class Manager(object):
         weather_id = pkmn['weather_id']
         previous_id = pkmn['previous_id']
         costume_id = pkmn['costume_id']
-        weather_name = self.__locale.get_weather_name(weather_id)
-        weather_emoji = self.__locale.get_weather_emoji(weather_id)
         time_id = pkmn['time_id']
-        weather_dynemoji = None
-
-        # Dynamic Icon (Need Sloppys/SkOODaTs RMap)
-        gendericon = ''
-        if gendername:
-            gendericon = '_' + Gender.Name(gendername)
-        formicon = ''
-        if pkmn_id == 201 or pkmn_id == 351:
-            formicon = '_' + Form.Name(form_id)
-        costumeicon = ''
-        if costume_id:
-            costumeicon = '_' + Costume.Name(costume_id)
-        medalicon = ''
-        if pkmn_id == 19 and pkmn['tiny_rat'] or pkmn_id == 129 and pkmn['big_karp']:
-            medalicon = '_MEDAL'
-        previousicon = ''
-        if pkmn_id == 132 and previous_id:
-            previousicon = '_' + '{:02}'.format(previous_id)
-        weathericon = ''
-        if weather_id:
-            weathericon = '_' + WeatherCondition.Name(weather_id)
-
-        pkm_icon = ('pkm_' +
-                    '{:03}'.format(pkmn_id) +
-                    medalicon +
-                    gendericon +
-                    formicon +
-                    costumeicon +
-                    weathericon +
-                    '_' + GetMapObjectsResponse.TimeOfDay.Name(time_id) +
-                    previousicon
-                    )
-
-        log.warning('FETCHING GENERATED ICON: %s', pkm_icon)
-
-        # Dynamic Weather Text
-        if time_id == 2:
-            if not weather_id == 1 and not weather_id == 3:
-                weather_dynemoji = self.__locale.get_weather_emoji(weather_id)
-            else:
-                weather_dynemoji = self.__locale.get_weather_emoji(weather_id + 10)
-        else:
-            weather_dynemoji = self.__locale.get_weather_emoji(weather_id)
-
-        if weather_name == 'None':
-            weather_name = ''
-        else:
-            weather_name = '[' + weather_dynemoji + ' ' + weather_name + ']\n'
+        weather_name, weather_emoji, weather_dynemoji = \
+            self.__locale.get_pokemon_weather(weather_id, time_id)
+
+        # Formatted once, for the icon and the DTS
+        pkmn_id_3 = '{:03}'.format(pkmn_id)
+        form_id_3 = '' if form_id == '?' else '{:03}'.format(form_id)
+
+        # Dynamic Icon (Need Sloppys/SkOODaTs RMap), only built if it's used
+        pkm_icon = ''
+        if 'pkm_icon' in self.__alarm_dts:
+            gendericon = ''
+            if gendername:
+                gendericon = '_' + Gender.Name(gendername)
+            formicon = ''
+            if pkmn_id == 201 or pkmn_id == 351:
+                formicon = '_' + Form.Name(form_id)
+            costumeicon = ''
+            if costume_id:
+                costumeicon = '_' + Costume.Name(costume_id)
+            medalicon = ''
+            if pkmn_id == 19 and pkmn['tiny_rat'] or pkmn_id == 129 and pkmn['big_karp']:
+                medalicon = '_MEDAL'
+            previousicon = ''
+            if pkmn_id == 132 and previous_id:
+                previousicon = '_{:02}'.format(previous_id)
+            weathericon = ''
+            if weather_id:
+                weathericon = '_' + WeatherCondition.Name(weather_id)
+
+            pkm_icon = 'pkm_{}{}{}{}{}{}_{}{}'.format(
+                pkmn_id_3, medalicon, gendericon, formicon, costumeicon,
+                weathericon, GetMapObjectsResponse.TimeOfDay.Name(time_id),
+                previousicon)
+
+            log.debug('FETCHING GENERATED ICON: %s', pkm_icon)
 
         if pkmn['previous_id']:
             pkmn['previous_id'] = '[' + get_pkmn_name(int(pkmn['previous_id'])) + ']'
 
         pkmn.update({
             'pkmn': name,
-            'pkmn_id_3': '{:03}'.format(pkmn_id),
+            'pkmn_id_3': pkmn_id_3,
             "dist": get_dist_as_str(dist) if dist != 'unkn' else 'unkn',
-            'time_left': time_str[0],
-            '12h_time': time_str[1],
-            '24h_time': time_str[2],
-            'dir': get_cardinal_dir([lat, lng], self.__location),
+            'time_left': time_left,
+            '12h_time': time_12,
+            '24h_time': time_24,
+            'dir': self.get_dir(lat, lng),
             'iv_0': "{:.0f}".format(iv) if iv != '?' else '?',
             'iv': "{:.1f}".format(iv) if iv != '?' else '?',
             'iv_2': "{:.2f}".format(iv) if iv != '?' else '?',
             'quick_move': self.__locale.get_move_name(quick_id),
             'charge_move': self.__locale.get_move_name(charge_id),
-            'form_id_or_empty': '' if form_id == '?' else '{:03}'.format(
-                form_id),
+            'form_id_or_empty': form_id_3,
             'form': form,
             'form_or_empty': '' if form == 'unknown' else form,
             'weather_id': weather_id,
@@ -942,16 +972,13 @@ class Manager(object):
         if self.__quiet is False:
             log.info("{} notification has been triggered!".format(name))
 
-        threads = []
-        # Spawn notifications in threads so they can work in background
-        for alarm in self.__alarms:
-            threads.append(gevent.spawn(alarm.pokemon_alert, pkmn))
-            gevent.sleep(0)  # explict context yield
-
-        for thread in threads:
-            thread.join()
+        self.send_alerts('pokemon_alert', pkmn)
 
     def process_pokestop(self, stop):
+        # Looked up once since they're used throughout
+        quiet = self.__quiet
+        location = self.__location
+
         # Make sure that pokemon are enabled
         if self.__pokestop_settings['enabled'] is False:
             log.debug("Pokestop ignored: pokestop notifications are disabled.")
@@ -968,28 +995,26 @@ class Manager(object):
 
         # Check the time remaining
         seconds_left = (stop['expire_time']
-                        - datetime.utcnow()).total_seconds()
+                        - self.__now).total_seconds()
         if seconds_left < self.__time_limit:
-            if self.__quiet is False:
-                log.info("Pokestop ({}) ignored: only {} "
-                         "seconds remaining.".format(stop_id, seconds_left))
+            if quiet is False:
+                log.info("Pokestop (%s) ignored: only %s "
+                         "seconds remaining.", stop_id, seconds_left)
             return
 
         # Extract some basic information
         lat, lng = stop['lat'], stop['lng']
-        dist = get_earth_dist([lat, lng], self.__location)
+        dist = self.get_dist(lat, lng)
         passed = False
         filters = self.__pokestop_settings['filters']
-        for filt_ct in range(len(filters)):
-            filt = filters[filt_ct]
+        for filt_ct, filt in enumerate(filters):
             # Check the distance from the set location
             if dist != 'unkn':
-                if filt.check_dist(dist) is False:
-                    if self.__quiet is False:
-                        log.info("Pokestop rejected: distance "
-                                 + "({:.2f}) was not in range".format(dist) +
-                                 " {:.2f} to {:.2f} (F #{})".format(
-                                     filt.min_dist, filt.max_dist, filt_ct))
+                if not filt.min_dist <= dist <= filt.max_dist:
+                    if quiet is False:
+                        log.info("Pokestop rejected: distance (%.2f) was "
+                                 "not in range %.2f to %.2f (F #%s)", dist,
+                                 filt.min_dist, filt.max_dist, filt_ct)
                     continue
             else:
                 log.debug("Pokestop dist was not checked because the manager "
@@ -997,7 +1022,7 @@ class Manager(object):
 
             # Nothing left to check, so it must have passed
             passed = True
-            log.debug("Pokstop passed filter #{}".format(filt_ct))
+            log.debug("Pokstop passed filter #%s", filt_ct)
             break
 
         if not passed:
@@ -1005,177 +1030,35 @@ class Manager(object):
 
         # Check the geofences
         stop['geofence'] = self.check_geofences('Pokestop', lat, lng)
-        if len(self.__geofences) > 0 and stop['geofence'] == 'unknown':
+        if self.__has_geofences and stop['geofence'] == 'unknown':
             log.info("Pokestop rejected: not within any specified geofence")
             return
 
-        time_str = get_time_as_str(stop['expire_time'], self.__timezone)
+        time_left, time_12, time_24 = get_time_as_str(
+            stop['expire_time'], self.__timezone)
         stop.update({
             "dist": get_dist_as_str(dist),
-            'time_left': time_str[0],
-            '12h_time': time_str[1],
-            '24h_time': time_str[2],
-            'dir': get_cardinal_dir([lat, lng], self.__location),
-            'mention': ''
-        })
-        if self.__loc_service:
-            self.__loc_service.add_optional_arguments(
-                self.__location, [lat, lng], stop)
-
-        if self.__quiet is False:
-            log.info("Pokestop ({})".format(stop_id)
-                     + " notification has been triggered!")
-
-        threads = []
-        # Spawn notifications in threads so they can work in background
-        for alarm in self.__alarms:
-            threads.append(gevent.spawn(alarm.pokestop_alert, stop))
-            gevent.sleep(0)  # explict context yield
-
-        for thread in threads:
-            thread.join()
-
-    def process_gym(self, gym):
-        gym_id = gym['id']
-
-        # Update Gym details (if they exist)
-        self.__cache.update_gym_info(
-            gym_id, gym['name'], gym['description'], gym['url'])
-
-        # Extract some basic information
-        to_team_id = gym['new_team_id']
-        from_team_id = self.__cache.get_gym_team(gym_id)
-        guard_pokemon_id = gym['guard_pkmn_id']
-
-        # Ignore changes to neutral
-        if self.__gym_settings['ignore_neutral'] and to_team_id == 0:
-            log.debug("Gym update ignored: changed to neutral")
-            return
-
-        # Update gym's last known team
-        self.__cache.update_gym_team(gym_id, to_team_id)
-
-        # Check if notifications are on
-        if self.__gym_settings['enabled'] is False:
-            log.debug("Gym ignored: notifications are disabled.")
-            return
-
-        # Doesn't look like anything to me
-        if to_team_id == from_team_id:
-            log.debug("Gym ignored: no change detected")
-            return
-
-        # Ignore first time updates
-        if from_team_id is '?':
-            log.debug("Gym update ignored: first time seeing this gym")
-            return
-
-        # Get some more info out used to check filters
-        lat, lng = gym['lat'], gym['lng']
-        dist = get_earth_dist([lat, lng], self.__location)
-        cur_team = self.__locale.get_team_name(to_team_id)
-        old_team = self.__locale.get_team_name(from_team_id)
-
-        filters = self.__gym_settings['filters']
-        passed = False
-        for filt_ct in range(len(filters)):
-            filt = filters[filt_ct]
-            # Check the distance from the set location
-            if dist != 'unkn':
-                if filt.check_dist(dist) is False:
-                    if self.__quiet is False:
-                        log.info("Gym rejected: distance ({:.2f})"
-                                 " was not in range"
-                                 " {:.2f} to {:.2f} (F #{})".format(
-                                     dist, filt.min_dist,
-                                     filt.max_dist, filt_ct))
-                    continue
-            else:
-                log.debug("Gym dist was not checked because the manager "
-                          + "has no location set.")
-
-            # Check the old team
-            if filt.check_from_team(from_team_id) is False:
-                if self.__quiet is False:
-                    log.info("Gym rejected: {} as old team is not correct "
-                             " (F #{})".format(old_team, filt_ct))
-                continue
-            # Check the new team
-            if filt.check_to_team(to_team_id) is False:
-                if self.__quiet is False:
-                    log.info("Gym rejected: {} as current team is not correct "
-                             "(F #{})".format(cur_team, filt_ct))
-                continue
-
-            # Nothing left to check, so it must have passed
-            passed = True
-            log.debug("Gym passed filter #{}".format(filt_ct))
-            break
-
-        if not passed:
-            return
-
-        # Check the geofences
-        gym['geofence'] = self.check_geofences('Gym', lat, lng)
-        if len(self.__geofences) > 0 and gym['geofence'] == 'unknown':
-            log.info("Gym rejected: not inside geofence(s)")
-            return
-
-        # Check if in geofences
-        if len(self.__geofences) > 0:
-            inside = False
-            for gf in self.__geofences:
-                inside |= gf.contains(lat, lng)
-            if inside is False:
-                if self.__quiet is False:
-                    log.info("Gym update ignored: located outside geofences.")
-                return
-        else:
-            log.debug("Gym inside geofences was not checked because "
-                      + " no geofences were set.")
-
-        gym_detail = self.__cache.get_gym_info(gym_id)
-
-        #Get park if needed
-        if self.__gym_settings['park_check'] is True and gym_info['park'] != 0:
-            park = "***This Gym Is A Possible EX Raid Location***"
-        else:
-            park = ''
-
-        gym.update({
-            "gym_name": gym_detail['name'],
-            "gym_description": gym_detail['description'],
-            "gym_url": gym_detail['url'],
-            "dist": get_dist_as_str(dist),
-            'dir': get_cardinal_dir([lat, lng], self.__location),
-            'new_team': cur_team,
-            'new_team_id': to_team_id,
-            'old_team': old_team,
-            'old_team_id': from_team_id,
-            'new_team_leader': self.__locale.get_leader_name(to_team_id),
-            'old_team_leader': self.__locale.get_leader_name(from_team_id),
-            'guard_pkmn_id': self.__locale.get_pokemon_name(guard_pokemon_id),
-            'park':park,
+            'time_left': time_left,
+            '12h_time': time_12,
+            '24h_time': time_24,
+            'dir': self.get_dir(lat, lng),
             'mention': ''
         })
         if self.__loc_service:
             self.__loc_service.add_optional_arguments(
-                self.__location, [lat, lng], gym)
+                location, [lat, lng], stop)
 
-        if self.__quiet is False:
-            log.info("Gym ({}) ".format(gym_id)
-                     + " notification has been triggered!")
+        if quiet is False:
+            log.info("Pokestop (%s) notification has been triggered!",
+                     stop_id)
 
-        threads = []
-        # Spawn notifications in threads so they can work in background
-        for alarm in self.__alarms:
-            threads.append(gevent.spawn(alarm.gym_alert, gym))
-            gevent.sleep(0)  # explict context yield
-
-        for thread in threads:
-            thread.join()
+        self.send_alerts('pokestop_alert', stop)
 
     def process_gym_info(self, gym_info):
+        # Looked up once since they're used throughout
+        quiet = self.__quiet
+        location = self.__location
+
         gym_id = gym_info['id']
 
         # Update Gym details (if they exist)
@@ -1208,27 +1091,26 @@ class Manager(object):
             return
 
         # Ignore first time updates
-        if from_team_id is '?': #and gym_info['is_in_battle'] == "False":
+        if from_team_id == '?': #and gym_info['is_in_battle'] == "False":
             log.info("Gym update ignored: first time seeing this gym")
             return
 
 
         # Get some more info out used to check filters
         lat, lng = gym_info['lat'], gym_info['lng']
-        dist = get_earth_dist([lat, lng], self.__location)
+        dist = self.get_dist(lat, lng)
         cur_team = self.__locale.get_team_name(to_team_id)
         old_team = self.__locale.get_team_name(from_team_id)
 
         filters = self.__gym_settings['filters']
         passed = False
-        for filt_ct in range(len(filters)):
-            filt = filters[filt_ct]
+        for filt_ct, filt in enumerate(filters):
             # Check the distance from the set location
             if dist != 'unkn':
-                if filt.check_dist(dist) is False:
-                    if self.__quiet is False:
-                        log.info("Gym rejected: distance ({:.2f}) was not in range" +
-                                 " {:.2f} to {:.2f} (F #{})".format(dist, filt.min_dist, filt.max_dist, filt_ct))
+                if not filt.min_dist <= dist <= filt.max_dist:
+                    if quiet is False:
+                        log.info("Gym rejected: distance (%.2f) was not in range"
+                                 " %.2f to %.2f (F #%s)", dist, filt.min_dist, filt.max_dist, filt_ct)
                     continue
             else:
                 log.debug("Gym dist was not checked because the manager "
@@ -1236,20 +1118,20 @@ class Manager(object):
 
             # Check the old team
             if filt.check_from_team(from_team_id) is False:
-                if self.__quiet is False:
-                    log.info("Gym rejected: {} as old team is not correct "
-                             " (F #{})".format(old_team, filt_ct))
+                if quiet is False:
+                    log.info("Gym rejected: %s as old team is not correct "
+                             " (F #%s)", old_team, filt_ct)
                 continue
             # Check the new team
             if filt.check_to_team(to_team_id) is False:
-                if self.__quiet is False:
-                    log.info("Gym rejected: {} as current team is not correct "
-                             "(F #{})".format(cur_team, filt_ct))
+                if quiet is False:
+                    log.info("Gym rejected: %s as current team is not correct "
+                             "(F #%s)", cur_team, filt_ct)
                 continue
 
             # Nothing left to check, so it must have passed
             passed = True
-            log.info("Gym passed filter #{}".format(filt_ct))
+            log.info("Gym passed filter #%s", filt_ct)
             break
 
         if not passed:
@@ -1257,23 +1139,10 @@ class Manager(object):
 
         # Check the geofences
         gym_info['geofence'] = self.check_geofences('Gym', lat, lng)
-        if len(self.__geofences) > 0 and gym_info['geofence'] == 'unknown':
+        if self.__has_geofences and gym_info['geofence'] == 'unknown':
             log.info("Gym rejected: not inside geofence(s)")
             return
 
-        # Check if in geofences
-        if len(self.__geofences) > 0:
-            inside = False
-            for gf in self.__geofences:
-                inside |= gf.contains(lat, lng)
-            if inside is False:
-                if self.__quiet is False:
-                    log.info("Gym update ignored: located outside geofences.")
-                return
-        else:
-            log.debug("Gym inside geofences was not checked because "
-                      + " no geofences were set.")
-
         #Get park if needed
         if self.__gym_settings['park_check'] is True and gym_info['park'] != 0:
             park = "***This Gym Is A Possible EX Raid Location***"
@@ -1306,7 +1175,7 @@ class Manager(object):
             "gym_description": gym_detail['description'],
             "gym_url": gym_detail['url'],
             "dist": get_dist_as_str(dist),
-            'dir': get_cardinal_dir([lat, lng], self.__location),
+            'dir': self.get_dir(lat, lng),
             'new_team': cur_team,
             'new_team_id': to_team_id,
             'old_team': old_team,
@@ -1325,20 +1194,12 @@ class Manager(object):
 
         if self.__loc_service:
             self.__loc_service.add_optional_arguments(
-                    self.__location, [lat, lng], gym_info)
+                    location, [lat, lng], gym_info)
 
-        if self.__quiet is False:
-            log.info("Gym ({}) ".format(gym_id)
-                     + " notification has been triggered!")
+        if quiet is False:
+            log.info("Gym (%s) notification has been triggered!", gym_id)
 
-        threads = []
-        # Spawn notifications in threads so they can work in background
-        for alarm in self.__alarms:
-            threads.append(gevent.spawn(alarm.gym_alert, gym_info))
-            gevent.sleep(0)  # explict context yield
-
-        for thread in threads:
-            thread.join()
+        self.send_alerts('gym_alert', gym_info)
 
     def process_egg(self, egg):
         # Quick check for enabled
@@ -1347,76 +1208,76 @@ class Manager(object):
             return
 
         gym_id = egg['id']
-        gym_info = self.__cache.get_gym_info(gym_id)
 
         # Check if egg has been processed yet
         if self.__cache.get_egg_expiration(gym_id) is not None:
             if self.__quiet is False:
-                log.info("Egg {} ".format(gym_id)
-                         + "ignored - previously processed.")
+                log.info("Egg %s ignored - previously processed.", gym_id)
             return
 
         # Update egg hatch
         self.__cache.update_egg_expiration(gym_id, egg['raid_begin'])
 
         # don't alert about (nearly) hatched eggs
-        seconds_left = (egg['raid_begin'] - datetime.utcnow()).total_seconds()
+        seconds_left = (egg['raid_begin'] - self.__now).total_seconds()
         if seconds_left < self.__time_limit:
             if self.__quiet is False:
-                log.info("Egg {} ignored. Egg hatch in {} seconds".format(
-                    gym_id, seconds_left))
+                log.info("Egg %s ignored. Egg hatch in %s seconds",
+                         gym_id, seconds_left)
             return
 
         lat, lng = egg['lat'], egg['lng']
-        dist = get_earth_dist([lat, lng], self.__location)
+        dist = self.get_dist(lat, lng)
         egg['dist'] = dist
 
+        # check if the level is in the filter range or if we are ignoring eggs
+        passed = self.check_egg_filter(self.__egg_settings, egg)
+
+        if not passed:
+            log.debug("Egg %s did not pass filter check", gym_id)
+            return
+
         # Check if egg gym filter has a contains field and if so check it
+        gym_info = self.__cache.get_gym_info(gym_id)
         if len(self.__egg_settings['contains']) > 0:
             log.debug("Egg gymname_contains "
-                      "filter: '{}'".format(self.__egg_settings['contains']))
-            log.debug("Egg Gym Name is '{}'".format(gym_info['name'].lower()))
-            log.debug("Egg Gym Info is '{}'".format(gym_info))
+                      "filter: '%s'", self.__egg_settings['contains'])
+            log.debug("Egg Gym Name is '%s'", gym_info['name'].lower())
+            log.debug("Egg Gym Info is '%s'", gym_info)
             if not any(x in gym_info['name'].lower()
                        for x in self.__egg_settings['contains']):
-                log.info("Egg {} ignored: gym name did not match the "
+                log.info("Egg %s ignored: gym name did not match the "
                          "gymname_contains "
-                         "filter.".format(gym_id))
+                         "filter.", gym_id)
                 return
 
         # Check if raid is in geofences
         egg['geofence'] = self.check_geofences('Raid', lat, lng)
-        if len(self.__geofences) > 0 and egg['geofence'] == 'unknown':
+        if self.__has_geofences and egg['geofence'] == 'unknown':
             if self.__quiet is False:
-                log.info("Egg {} ".format(gym_id)
-                         + "ignored: located outside geofences.")
+                log.info("Egg %s ignored: located outside geofences.",
+                         gym_id)
             return
         else:
             log.debug("Egg inside geofence was not checked because no "
                       + "geofences were set.")
 
-        # check if the level is in the filter range or if we are ignoring eggs
-        passed = self.check_egg_filter(self.__egg_settings, egg)
-
-        if not passed:
-            log.debug("Egg {} did not pass filter check".format(gym_id))
-            return
-
         if self.__loc_service:
             self.__loc_service.add_optional_arguments(
                 self.__location, [lat, lng], egg)
 
         if self.__quiet is False:
-            log.info("Egg ({})".format(gym_id)
-                     + " notification has been triggered!")
+            log.info("Egg (%s) notification has been triggered!", gym_id)
 
-        time_str = get_time_as_str(egg['raid_end'], self.__timezone)
-        start_time_str = get_time_as_str(egg['raid_begin'], self.__timezone)
+        time_left, time_12, time_24 = get_time_as_str(
+            egg['raid_end'], self.__timezone)
+        begin_time_left, begin_12, begin_24 = get_time_as_str(
+            egg['raid_begin'], self.__timezone)
 
         #team_id = egg['team_id']
         # team id is provided either directly in webhook data or saved in cache when processing gym
         team_id = egg.get('team_id') or self.__cache.get_gym_team(gym_id)
-        gym_detail = self.__cache.get_gym_info(gym_id)
+        team_name = self.__locale.get_team_name(team_id)
 
         #Get park if needed
         if self.__egg_settings['park_check'] is True and egg['park'] != 0:
@@ -1426,32 +1287,26 @@ class Manager(object):
 
         # Dynamic Icon (Need Sloppys/SkOODaTs RMap)
         # Team, Level, RaidLevel
-        if egg['slots_available'] > 0:
-            gymlevel = '{}'.format(6 - egg['slots_available'])
-        else:
-            gymlevel = '6'
-        icnlevel = '_L{}'.format(6 - egg['slots_available'])
-        icnraidlevel = '_R{}'.format(egg['raid_level'])
+        level = 6 - egg['slots_available']
+        gymlevel = '{}'.format(level) if egg['slots_available'] > 0 else '6'
         #icnbattle = '_Battle' if gym_info['is_in_battle'] == 1 else ''
-        gym_icon = (self.__locale.get_team_name(team_id) +
-                    icnlevel +
-                    icnraidlevel)
+        gym_icon = team_name + '_L{}_R{}'.format(level, egg['raid_level'])
         log.debug('FETCHING GENERATED ICON: %s', gym_icon)
 
         egg.update({
-            "gym_name": gym_detail['name'],
-            "gym_description": gym_detail['description'],
-            "gym_url": gym_detail['url'],
-            'time_left': time_str[0],
-            '12h_time': time_str[1],
-            '24h_time': time_str[2],
-            'begin_time_left': start_time_str[0],
-            'begin_12h_time': start_time_str[1],
-            'begin_24h_time': start_time_str[2],
+            "gym_name": gym_info['name'],
+            "gym_description": gym_info['description'],
+            "gym_url": gym_info['url'],
+            'time_left': time_left,
+            '12h_time': time_12,
+            '24h_time': time_24,
+            'begin_time_left': begin_time_left,
+            'begin_12h_time': begin_12,
+            'begin_24h_time': begin_24,
             "dist": get_dist_as_str(dist),
-            'dir': get_cardinal_dir([lat, lng], self.__location),
+            'dir': self.get_dir(lat, lng),
             'team_id': team_id,
-            'team_name': self.__locale.get_team_name(team_id),
+            'team_name': team_name,
             'team_leader': self.__locale.get_leader_name(team_id),
             'gymlevel': gymlevel,
             'gym_icon': gym_icon,
@@ -1459,14 +1314,7 @@ class Manager(object):
             'mention': ''
         })
 
-        threads = []
-        # Spawn notifications in threads so they can work in background
-        for alarm in self.__alarms:
-            threads.append(gevent.spawn(alarm.raid_egg_alert, egg))
-            gevent.sleep(0)  # explict context yield
-
-        for thread in threads:
-            thread.join()
+        self.send_alerts('raid_egg_alert', egg)
 
     def process_raid(self, raid):
         # Quick check for enabled
@@ -1475,68 +1323,42 @@ class Manager(object):
             return
 
         gym_id = raid['id']
-        gym_info = self.__cache.get_gym_info(gym_id)
-
-        pkmn_id = raid['pkmn_id']
-        raid_end = raid['raid_end']
 
         # Check if raid has been processed
         if self.__cache.get_raid_expiration(gym_id) is not None:
             if self.__quiet is False:
-                log.info("Raid {} ignored. ".format(gym_id)
-                         + "Was previously processed.")
+                log.info("Raid %s ignored. Was previously processed.", gym_id)
             return
 
+        pkmn_id = raid['pkmn_id']
+        raid_end = raid['raid_end']
+
         self.__cache.update_raid_expiration(gym_id, raid_end)
 
-        log.debug(self.__cache.get_raid_expiration(gym_id))
+        log.debug("Raid %s expires at %s", gym_id, raid_end)
 
         # don't alert about expired raids
-        seconds_left = (raid_end - datetime.utcnow()).total_seconds()
+        seconds_left = (raid_end - self.__now).total_seconds()
         if seconds_left < self.__time_limit:
             if self.__quiet is False:
-                log.info("Raid {} ignored. Only {} seconds left.".format(
-                    gym_id, seconds_left))
+                log.info("Raid %s ignored. Only %s seconds left.",
+                         gym_id, seconds_left)
             return
 
-        lat, lng = raid['lat'], raid['lng']
-        dist = get_earth_dist([lat, lng], self.__location)
-
-        # Check if raid gym filter has a contains field and if so check it
-        if len(self.__raid_settings['contains']) > 0:
-            log.debug("Raid gymname_contains "
-                      "filter: '{}'".format(self.__raid_settings['contains']))
-            log.debug("Raid Gym Name is '{}'".format(gym_info['name'].lower()))
-            log.debug("Raid Gym Info is '{}'".format(gym_info))
-            if not any(x in gym_info['name'].lower()
-                       for x in self.__raid_settings['contains']):
-                log.info("Raid {} ignored: gym name did not match the "
-                         "gymname_contains "
-                         "filter.".format(gym_id))
-                return
+        #  check filters for pokemon, since they reject the most raids
+        name = self.__locale.get_pokemon_name(pkmn_id)
 
-        # Check if raid is in geofences
-        raid['geofence'] = self.check_geofences('Raid', lat, lng)
-        if len(self.__geofences) > 0 and raid['geofence'] == 'unknown':
+        filters = get_pokemon_filters(self.__raid_settings['filters'], pkmn_id)
+        if filters is None:
             if self.__quiet is False:
-                log.info("Raid {} ignored: ".format(gym_id)
-                         + "located outside geofences.")
+                log.info("Raid on %s ignored: no filters are set", name)
             return
-        else:
-            log.debug("Raid inside geofence was not checked "
-                      + " because no geofences were set.")
 
+        lat, lng = raid['lat'], raid['lng']
+        dist = self.get_dist(lat, lng)
         quick_id = raid['quick_id']
         charge_id = raid['charge_id']
 
-        #  check filters for pokemon
-        name = self.__locale.get_pokemon_name(pkmn_id)
-
-        if pkmn_id not in self.__raid_settings['filters']:
-            if self.__quiet is False:
-                log.info("Raid on {} ignored: no filters are set".format(name))
-            return
-
         # TODO: Raid filters - don't need all of these attributes/checks
         raid_pkmn = {
             'pkmn': name,
@@ -1556,30 +1378,57 @@ class Manager(object):
             'mention': None
         }
 
-        filters = self.__raid_settings['filters'][pkmn_id]
         passed, mention = self.check_pokemon_filter(filters, raid_pkmn, dist)
         # If we didn't pass any filters
         if not passed:
-            log.debug("Raid {} did not pass pokemon check".format(gym_id))
+            log.debug("Raid %s did not pass pokemon check", gym_id)
             return
 
+        # Check if raid gym filter has a contains field and if so check it
+        gym_info = self.__cache.get_gym_info(gym_id)
+        if len(self.__raid_settings['contains']) > 0:
+            gym_name = gym_info['name'].lower()
+            log.debug("Raid gymname_contains "
+                      "filter: '%s'", self.__raid_settings['contains'])
+            log.debug("Raid Gym Name is '%s'", gym_name)
+            log.debug("Raid Gym Info is '%s'", gym_info)
+            if not any(x in gym_name
+                       for x in self.__raid_settings['contains']):
+                log.info("Raid %s ignored: gym name did not match the "
+                         "gymname_contains "
+                         "filter.", gym_id)
+                return
+
+        # Check if raid is in geofences
+        raid['geofence'] = self.check_geofences('Raid', lat, lng)
+        if self.__has_geofences and raid['geofence'] == 'unknown':
+            if self.__quiet is False:
+                log.info("Raid %s ignored: located outside geofences.",
+                         gym_id)
+            return
+        else:
+            log.debug("Raid inside geofence was not checked "
+                      + " because no geofences were set.")
+
         if self.__loc_service:
             self.__loc_service.add_optional_arguments(
                 self.__location, [lat, lng], raid)
 
         if self.__quiet is False:
-            log.info("Raid ({}) notification ".format(gym_id)
-                     + "has been triggered!")
+            log.info("Raid (%s) notification has been triggered!", gym_id)
 
-        time_str = get_time_as_str(
+        time_left, time_12, time_24 = get_time_as_str(
             raid['raid_end'], self.__timezone)
-        start_time_str = get_time_as_str(raid['raid_begin'], self.__timezone)
+        begin_time_left, begin_12, begin_24 = get_time_as_str(
+            raid['raid_begin'], self.__timezone)
 
         # team id is provided either directly in webhook data or saved in cache when processing gym
         team_id = raid.get('team_id') or self.__cache.get_gym_team(gym_id)
-        gym_detail = self.__cache.get_gym_info(gym_id)
+        team_name = self.__locale.get_team_name(team_id)
         form_id = raid_pkmn['form_id']
         form = self.__locale.get_form_name(pkmn_id, form_id)
+        form_id_3 = '' if form_id == '?' else '{:03}'.format(form_id)
+        pkmn_id_3 = '{:03}'.format(pkmn_id)
         min_cp, max_cp = get_pokemon_cp_range(pkmn_id, 20)
 
         #Get park if needed
@@ -1590,42 +1439,34 @@ class Manager(object):
 
         # Dynamic Icon (Need Sloppys/SkOODaTs RMap)
         # Team, Level, RaidLevel, RaidPokemon
-        if raid['slots_available'] > 0:
-            gymlevel = '{}'.format(6 - raid['slots_available'])
-        else:
-            gymlevel = '6'
-        icnlevel = '_L{}'.format(6 - raid['slots_available'])
-        icnraidlevel = '_R{}'.format(raid['raid_level'])
-        icnpkmnid = '_P{}'.format(raid['pkmn_id'])
+        level = 6 - raid['slots_available']
+        gymlevel = '{}'.format(level) if raid['slots_available'] > 0 else '6'
         #icnbattle = '_Battle' if gym_info['is_in_battle'] == 1 else ''
-        gym_icon = (self.__locale.get_team_name(team_id) +
-                    icnlevel +
-                    icnraidlevel +
-                    icnpkmnid)
+        gym_icon = team_name + '_L{}_R{}_P{}'.format(
+            level, raid['raid_level'], pkmn_id)
         log.debug('FETCHING GENERATED ICON: %s', gym_icon)
 
         raid.update({
             'pkmn': name,
-            'pkmn_id_3': '{:03}'.format(pkmn_id),
-            "gym_name": gym_detail['name'],
-            "gym_description": gym_detail['description'],
-            "gym_url": gym_detail['url'],
-            'time_left': time_str[0],
-            '12h_time': time_str[1],
-            '24h_time': time_str[2],
-            'begin_time_left': start_time_str[0],
-            'begin_12h_time': start_time_str[1],
-            'begin_24h_time': start_time_str[2],
+            'pkmn_id_3': pkmn_id_3,
+            "gym_name": gym_info['name'],
+            "gym_description": gym_info['description'],
+            "gym_url": gym_info['url'],
+            'time_left': time_left,
+            '12h_time': time_12,
+            '24h_time': time_24,
+            'begin_time_left': begin_time_left,
+            'begin_12h_time': begin_12,
+            'begin_24h_time': begin_24,
             "dist": get_dist_as_str(dist),
-            'dir': get_cardinal_dir([lat, lng], self.__location),
+            'dir': self.get_dir(lat, lng),
             'quick_move': self.__locale.get_move_name(quick_id),
             'charge_move': self.__locale.get_move_name(charge_id),
-            'form_id_or_empty': '' if form_id == '?'
-                                else '{:03}'.format(form_id),
+            'form_id_or_empty': form_id_3,
             'form': form,
             'form_or_empty': '' if form == 'unknown' else form,
             'team_id': team_id,
-            'team_name': self.__locale.get_team_name(team_id),
+            'team_name': team_name,
             'team_leader': self.__locale.get_leader_name(team_id),
             'min_cp': min_cp,
             'max_cp': max_cp,
@@ -1635,15 +1476,7 @@ class Manager(object):
             'mention': mention
         })
 
-        threads = []
-        # Spawn notifications in threads so they can work in background
-        for alarm in self.__alarms:
-            threads.append(gevent.spawn(alarm.raid_alert, raid))
-
-            gevent.sleep(0)  # explict context yield
-
-        for thread in threads:
-            thread.join()
+        self.send_alerts('raid_alert', raid)
 
     def process_weather(self, weather):
         # Make sure that weather is enabled
@@ -1657,30 +1490,29 @@ class Manager(object):
         from_gameplay_weather = self.__cache.get_weather_change(weather_id)
         from_severity_weather = self.__cache.get_severity_change(weather_id)
 
-        # Update weather's last known id
-        self.__cache.update_weather_change(weather_id, to_gameplay_weather)
-        self.__cache.update_severity_change(weather_id, to_severity_weather)
-
-        # Doesn't look like anything to me
+        # Doesn't look like anything to me (and the cache already has it)
         if to_gameplay_weather == from_gameplay_weather and to_severity_weather == from_severity_weather:
             log.debug("Weather ignored: no change detected")
             return
 
+        # Update weather's last known id
+        self.__cache.update_weather_change(weather_id, to_gameplay_weather)
+        self.__cache.update_severity_change(weather_id, to_severity_weather)
+
         # Ignore first time updates
-        if from_gameplay_weather is '?' or from_severity_weather is '?':
+        if from_gameplay_weather == '?' or from_severity_weather == '?':
             log.debug("Weather update ignored: first time seeing this weather id")
             return
 
         # Extract some basic information
         lat, lng = weather['lat'], weather['lng']
-        dist = get_earth_dist([lat, lng], self.__location)
+        dist = self.get_dist(lat, lng)
         passed = False
         filters = self.__weather_settings['filters']
-        for filt_ct in range(len(filters)):
-            filt = filters[filt_ct]
+        for filt_ct, filt in enumerate(filters):
             # Check the distance from the set location
             if dist != 'unkn':
-                if filt.check_dist(dist) is False:
+                if not filt.min_dist <= dist <= filt.max_dist:
                     if self.__quiet is False:
                         log.info("Weather rejected: distance "
                                  + "({:.2f}) was not in range".format(dist) +
@@ -1701,48 +1533,20 @@ class Manager(object):
 
         # Check the geofences
         weather['geofence'] = self.check_geofences('Weather', lat, lng)
-        if len(self.__geofences) > 0 and weather['geofence'] == 'unknown':
+        if self.__has_geofences and weather['geofence'] == 'unknown':
             log.info("Weather rejected: not within any specified geofence")
             return
 
         gameplay_weather = weather['gameplay_weather']
         severity = weather['severity']
         time = weather['world_time']
-        weather_icon = None
-        weather_dynname = None
-        weather_dynemoji = None
         # Dynamic Icons And Names
-        # Severity Alert
-        if severity >= 1:
-            weather_icon = self.__locale.get_severity_name(severity)
-            weather_dynname = self.__locale.get_severity_name(severity) + ' Alert'
-            if time == 2:
-                if not gameplay_weather == 1 and not gameplay_weather == 3:
-                    weather_dynemoji = self.__locale.get_weather_emoji(gameplay_weather)
-                else:
-                    weather_dynemoji = self.__locale.get_weather_emoji(gameplay_weather + 10)
-            else:
-                weather_dynemoji = self.__locale.get_weather_emoji(gameplay_weather)
-        # Regular Alert
-        elif time == 2:
-            if not gameplay_weather == 1 and not gameplay_weather == 3:
-                weather_icon = self.__locale.get_weather_name(gameplay_weather)
-                weather_dynname = (self.__locale.get_weather_emoji(gameplay_weather) +
-                                    ' ' + self.__locale.get_weather_name(gameplay_weather))
-                weather_dynemoji = self.__locale.get_weather_emoji(gameplay_weather)
-            else:
-                weather_icon = self.__locale.get_weather_name(gameplay_weather + 10)
-                weather_dynname = (self.__locale.get_weather_emoji(gameplay_weather + 10) +
-                                    ' ' + self.__locale.get_weather_name(gameplay_weather))
-                weather_dynemoji = self.__locale.get_weather_emoji(gameplay_weather + 10)
-        else:
-            weather_icon = self.__locale.get_weather_name(gameplay_weather)
-            weather_dynname = (self.__locale.get_weather_emoji(gameplay_weather) +
-                                ' ' + self.__locale.get_weather_name(gameplay_weather))
-            weather_dynemoji = self.__locale.get_weather_emoji(gameplay_weather)
+        weather_name, weather_emoji, severity_name, weather_icon, \
+            weather_dynname, weather_dynemoji = self.__locale.get_weather_alert(
+                gameplay_weather, severity, time)
 
         weather.update({
-            'weather_name': self.__locale.get_weather_name(gameplay_weather),
+            'weather_name': weather_name,
             'weather_dynname': weather_dynname,
             'weather_icon': weather_icon,
             'cloud': self.__locale.get_display_name(weather['cloud_level']),
@@ -1750,15 +1554,15 @@ class Manager(object):
             'wind': self.__locale.get_display_name(weather['wind_level']),
             'snow': self.__locale.get_display_name(weather['snow_level']),
             'fog': self.__locale.get_display_name(weather['fog_level']),
-            'severity_name': self.__locale.get_severity_name(severity),
+            'severity_name': severity_name,
             'warning': 'Active' if weather['warn_weather'] == 1
                                 else 'None',
             'time_name': self.__locale.get_time_name(time),
             'wind_dir': degrees_to_cardinal(weather['wind_direction']),
-            'weather_emoji': self.__locale.get_weather_emoji(gameplay_weather),
+            'weather_emoji': weather_emoji,
             'weather_dynemoji': weather_dynemoji,
             "dist": get_dist_as_str(dist),
-            'dir': get_cardinal_dir([lat, lng], self.__location),
+            'dir': self.get_dir(lat, lng),
             'mention': ''
         })
 
@@ -1770,28 +1574,53 @@ class Manager(object):
             log.info("Weather ({})".format(weather_id)
                      + " notification has been triggered!")
 
-        threads = []
-        # Spawn notifications in threads so they can work in background
-        for alarm in self.__alarms:
-            threads.append(gevent.spawn(alarm.weather_alert, weather))
-            gevent.sleep(0)  # explict context yield
-
-        for thread in threads:
-            thread.join()
+        self.send_alerts('weather_alert', weather)
 
     def process_location(self, coords):
         loc_str = "{}, {}".format(coords['latitude'], coords['longitude'])
         self.set_location(loc_str)
 
+    # Returns the distance from the set location to the point (or 'unkn')
+    def get_dist(self, lat, lng):
+        if self.__origin is None:
+            return 'unkn'
+        return get_earth_dist_to(lat, lng, self.__origin)
+
+    # Returns the direction from the set location to the point (or '?')
+    def get_dir(self, lat, lng):
+        if self.__origin is None:
+            return '?'
+        return get_cardinal_dir_to(lat, lng, self.__origin)
+
+    # Send the info to each alarm with the given alert method. All but the
+    # last alarm are sent in greenlets so they can work in the background
+    # while the last one is sent from this greenlet
+    def send_alerts(self, alert, info):
+        alarms = self.__alarms
+        if len(alarms) == 0:
+            return
+        greenlets = [gevent.spawn(getattr(alarm, alert), info)
+                     for alarm in alarms[:-1]]
+        getattr(alarms[-1], alert)(info)
+        if greenlets:
+            gevent.joinall(greenlets)
+
     # Check to see if a notification is within the given range
     def check_geofences(self, name, lat, lng):
-        for gf in self.__geofences:
-            if gf.contains(lat, lng):
-                log.debug("{} is in geofence {}!".format(name, gf.get_name()))
+        bounds = self.__geofence_bounds
+        if self.__geofence_index is not None:
+            # Only the boxes around the point, still in the geofence file order
+            bounds = [bounds[i] for i in sorted(
+                self.__geofence_index.intersection((lat, lng, lat, lng)))]
+        debug = log.isEnabledFor(logging.DEBUG)
+        for gf, (min_x, min_y, max_x, max_y) in bounds:
+            # Only raycast the geofences whose boundary box has the point
+            if min_x <= lat <= max_x and min_y <= lng <= max_y \
+                    and gf.contains(lat, lng):
+                log.debug("%s is in geofence %s!", name, gf.get_name())
                 return gf.get_name()
-            else:
-                log.debug("{} is not in geofence {}".format(
-                    name, gf.get_name()))
+            elif debug:
+                log.debug("%s is not in geofence %s", name, gf.get_name())
         return 'unknown'
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
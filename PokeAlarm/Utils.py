@@ -24,18 +24,45 @@ def contains_arg(line, args):
 
 
 def get_path(path):
-    if not os.path.isabs(path):  # If not absolute path
-        path = os.path.join(config['ROOT_PATH'], path)
-    return path
+    # The same few paths are resolved over and over, so remember them
+    if not hasattr(get_path, 'cache'):
+        get_path.cache = {}
+    key = (config['ROOT_PATH'], path)
+    full_path = get_path.cache.get(key)
+    if full_path is None:
+        full_path = path
+        if not os.path.isabs(path):  # If not absolute path
+            full_path = os.path.join(config['ROOT_PATH'], path)
+        get_path.cache[key] = full_path
+    return full_path
+
+
+# Returns the parsed contents of a JSON file
+def load_json_file(file_path):
+    with open(file_path, 'r') as f:
+        return json.load(f)
 
 
 def parse_boolean(val):
+    # Config files repeat the same few values, so remember recent results
+    if not hasattr(parse_boolean, 'cache'):
+        parse_boolean.cache = {}
+    try:
+        key = (type(val), val)  # Keep 1 and True apart
+        return parse_boolean.cache[key]
+    except KeyError:
+        pass
+    except TypeError:  # Unhashable values (lists, dicts) are never booleans
+        return None
     b = str(val).lower()
+    rtn = None
     if b in {'t', 'true', 'y', 'yes'}:
-        return True
-    if b in ('f', 'false', 'n', 'no'):
-        return False
-    return None
+        rtn = True
+    elif b in ('f', 'false', 'n', 'no'):
+        rtn = False
+    if len(parse_boolean.cache) < 64:
+        parse_boolean.cache[key] = rtn
+    return rtn
 
 
 def parse_unicode(bytestring):
@@ -125,9 +152,13 @@ def get_pkmn_id(pokemon_name):
 
 # Returns the id corresponding with the move (use all locales for flexibility)
 def get_move_id(move_name):
-    name = move_name.lower()
-    if not hasattr(get_move_id, 'ids'):
-        get_move_id.ids = {}
+    return get_move_ids((move_name,))[0]
+
+
+# Returns the ids corresponding with each of the moves (None if not found)
+def get_move_ids(move_names):
+    if not hasattr(get_move_ids, 'ids'):
+        get_move_ids.ids = {}
         files = glob(get_path('locales/*.json'))
         for file_ in files:
             with open(file_, 'r') as f:
@@ -135,8 +166,9 @@ def get_move_id(move_name):
                 j = j['moves']
                 for id_ in j:
                     nm = j[id_].lower()
-                    get_move_id.ids[nm] = int(id_)
-    return get_move_id.ids.get(name)
+                    get_move_ids.ids[nm] = int(id_)
+    ids = get_move_ids.ids
+    return [ids.get(name.lower()) for name in move_names]
 
 
 # Returns the id corresponding with the pokemon name
@@ -432,19 +464,42 @@ def get_static_map_url(settings, api_key=None):  # TODO: optimize formatting
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~ GENERAL UTILITIES ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
 
+# ASCII digits, the only ones accepted in a plain decimal
+_DIGITS = frozenset('0123456789')
+
+
+# Returns True if the string is a plain decimal like '-12.34' (an optional
+# minus, then digits, a dot and more digits), else False
+def is_plain_decimal(s):
+    if s[:1] == '-':
+        s = s[1:]
+    whole, dot, frac = s.partition('.')
+    return whole != '' and frac != '' \
+        and _DIGITS.issuperset(whole) and _DIGITS.issuperset(frac)
+
+
+# Bearings rounded to 45 degrees, starting from (and ending with) south
+CARDINAL_DIRS = ("S", "SE", "E", "NE", "N", "NW", "W", "SW", "S")
+
 
 # Returns a cardinal direction (N/NW/W/SW, etc)
 # of the pokemon from the origin point, if set
 def get_cardinal_dir(pt_a, pt_b=None):
     if pt_b is None:
         return '?'
+    return get_cardinal_dir_to(pt_a[0], pt_a[1], get_earth_origin(pt_b))
+
 
-    lat1, lng1, lat2, lng2 = map(radians, [pt_b[0], pt_b[1], pt_a[0], pt_a[1]])
-    directions = ["S", "SE", "E", "NE", "N", "NW", "W", "SW", "S"]
+# Returns the cardinal direction of the point at lat, lng from an earth origin
+def get_cardinal_dir_to(lat, lng, origin):
+    lat1, lng1, cos_lat1, sin_lat1 = origin
+    lat2 = radians(lat)
+    lng_delta = radians(lng) - lng1
+    cos_lat2 = cos(lat2)
     bearing = (degrees(atan2(
-        cos(lat1) * sin(lat2) - sin(lat1) * cos(lat2) * cos(lng2 - lng1),
-        sin(lng2 - lng1) * cos(lat2))) + 450) % 360
-    return directions[int(round(bearing / 45))]
+        cos_lat1 * sin(lat2) - sin_lat1 * cos_lat2 * cos(lng_delta),
+        sin(lng_delta) * cos_lat2)) + 450) % 360
+    return CARDINAL_DIRS[int(round(bearing / 45))]
 
 def degrees_to_cardinal(d):
     dirs = ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
@@ -474,15 +529,25 @@ def get_dist_as_str(dist):
 def get_earth_dist(pt_a, pt_b=None):
     if type(pt_a) is str or pt_b is None:
         return 'unkn'  # No location set
-    log.debug("Calculating distance from {} to {}".format(pt_a, pt_b))
-    lat_a = radians(pt_a[0])
-    lng_a = radians(pt_a[1])
-    lat_b = radians(pt_b[0])
-    lng_b = radians(pt_b[1])
+    log.debug("Calculating distance from %s to %s", pt_a, pt_b)
+    return get_earth_dist_to(pt_a[0], pt_a[1], get_earth_origin(pt_b))
+
+
+# Returns the trig of a point reused by get_earth_dist_to and
+# get_cardinal_dir_to, as (lat in radians, lng in radians, cos lat, sin lat)
+def get_earth_origin(pt):
+    lat = radians(pt[0])
+    return lat, radians(pt[1]), cos(lat), sin(lat)
+
+
+# Returns the distance from the point at lat, lng to an earth origin
+def get_earth_dist_to(lat, lng, origin):
+    lat_b, lng_b, cos_lat_b, _ = origin
+    lat_a = radians(lat)
     lat_delta = lat_b - lat_a
-    lng_delta = lng_b - lng_a
+    lng_delta = lng_b - radians(lng)
     a = sin(lat_delta / 2) ** 2 + cos(lat_a) * \
-        cos(lat_b) * sin(lng_delta / 2) ** 2
+        cos_lat_b * sin(lng_delta / 2) ** 2
     c = 2 * atan2(sqrt(a), sqrt(1 - a))
     radius = 6373000  # radius of earth in meters
     if config['UNITS'] == 'imperial':
@@ -506,8 +571,7 @@ def get_time_as_str(t, timezone=None):
     # Time remaining in minutes and seconds
     time_left = "%dm %ds" % (m, s) if h == 0 else "%dh %dm" % (h, m)
     # Disappear time in 12h format, eg "2:30:16 PM"
-    time_12 = disappear_time.strftime("%I:%M:%S") \
-        + disappear_time.strftime("%p").lower()
+    time_12 = disappear_time.strftime("%I:%M:%S%p").lower()
     # Disappear time in 24h format including seconds, eg "14:30:16"
     time_24 = disappear_time.strftime("%H:%M:%S")
     return time_left, time_12, time_24
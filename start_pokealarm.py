@@ -10,6 +10,10 @@ import logging
 logging.basicConfig(
     format='%(asctime)s [%(processName)15.15s][%(name)10.10s]'
            + '[%(levelname)8.8s] %(message)s', level=logging.INFO)
+# Nothing logged uses the caller, thread or process id, so don't collect them
+logging._srcfile = None
+logging.logThreads = 0
+logging.logProcesses = 0
 
 # Standard Library Imports
 import configargparse